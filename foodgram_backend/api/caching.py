@@ -0,0 +1,101 @@
+import logging
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+
+from recipes.background import enqueue
+
+logger = logging.getLogger('foodgram.jobs')
+
+# Recipe responses embed tags and ingredients, so they carry their keys.
+RECIPE_KEYS = ('tags', 'ingredients')
+
+
+class SurrogateKeyMixin:
+    """
+    Viewset mixin letting the proxy cache anonymous JSON reads. Responses
+    of cached_actions get a shared cache timeout of proxy_cache_timeout
+    seconds and a Surrogate-Key header listing surrogate_keys and the
+    keys added by the action, which are purged when the data changes.
+    """
+
+    cached_actions = ('list', 'retrieve')
+    surrogate_keys = ()
+    proxy_cache_timeout = None
+
+    def add_surrogate_keys(self, *keys):
+        self._surrogate_keys = getattr(self, '_surrogate_keys', set())
+        self._surrogate_keys.update(keys)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if (
+            request.method in ('GET', 'HEAD')
+            and self.action in self.cached_actions
+            and response.status_code in (200, 304)
+            and not request.user.is_authenticated
+            and getattr(request, 'accepted_renderer', None) is not None
+            and request.accepted_renderer.format == 'json'
+        ):
+            timeout = (
+                self.proxy_cache_timeout or settings.PROXY_CACHE_TIMEOUT
+            )
+            keys = {
+                *self.surrogate_keys, *getattr(self, '_surrogate_keys', ())
+            }
+            response['Cache-Control'] = (
+                f'public, max-age=0, s-maxage={timeout}'
+            )
+            # nginx reads the timeout from this header and drops it.
+            response['X-Accel-Expires'] = str(timeout)
+            response['Surrogate-Key'] = ' '.join(sorted(keys))
+        return response
+
+
+def recipe_keys(recipe):
+    return (f'recipe-{recipe.id}', f'author-{recipe.author_id}')
+
+
+def purge_paths(key):
+    """
+    Return the nginx cache keys holding responses with a surrogate key,
+    a trailing * matching any rest. nginx cannot look entries up by
+    header, so a key maps to the URLs its responses live under.
+    """
+    if key in ('tags', 'ingredients'):
+        return (f'/api/{key}/*', '/api/recipes/*')
+    if key == 'recipes':
+        return ('/api/recipes/', '/api/recipes/?*')
+    kind, _, object_id = key.partition('-')
+    if kind == 'recipe':
+        return (f'/api/recipes/{object_id}/*',)
+    if kind == 'author':
+        return (f'/api/users/{object_id}/*', '/api/recipes/*')
+    return ()
+
+
+def purge(keys):
+    """Send PURGE requests for the keys to every PROXY_CACHE_PURGE_URLS."""
+    paths = {path for key in keys for path in purge_paths(key)}
+    for base_url in settings.PROXY_CACHE_PURGE_URLS:
+        for path in sorted(paths):
+            try:
+                urlopen(
+                    Request(f'{base_url}{path}', method='PURGE'),
+                    timeout=settings.PROXY_CACHE_PURGE_TIMEOUT
+                ).close()
+            except HTTPError as error:
+                # Nothing was cached under the key.
+                if error.code != 404:
+                    raise
+        logger.info('Purged %s from %s', ', '.join(sorted(keys)), base_url)
+
+
+def purge_later(*keys):
+    """Queue a purge of the keys, run once the transaction commits."""
+    if settings.PROXY_CACHE_PURGE_URLS:
+        keys = sorted(set(keys))
+        enqueue(purge, keys, key=f'purge:{",".join(keys)}')
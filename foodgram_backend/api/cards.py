@@ -0,0 +1,185 @@
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from rest_framework import serializers
+
+from api.caching import purge_later
+from api.serializers import (
+    RecipeIngredientSerializer,
+    RecipeListSerializer,
+    TagSerializer,
+    UserSerializer,
+    is_subscribed
+)
+from recipes import tag_bits
+from recipes.models import Recipe, RecipeCard, RecipeIngredient
+
+User = get_user_model()
+
+# Fields of RecipeListSerializer stored in a card.
+CARD_FIELDS = ('tags', 'author', 'ingredients')
+
+# User fields copied to the cards of the user's recipes.
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name')
+
+
+class CardAuthorSerializer(UserSerializer):
+    """Serializer for the author of a card, without the per-user flag."""
+
+    is_subscribed = None
+
+    class Meta(UserSerializer.Meta):
+        fields = ('email', 'id', 'username', 'first_name', 'last_name')
+
+
+class CardDataSerializer(serializers.ModelSerializer):
+    """Serializer rendering the stored part of a recipe card."""
+
+    tags = serializers.SerializerMethodField()
+    author = CardAuthorSerializer(read_only=True)
+    ingredients = RecipeIngredientSerializer(
+        many=True,
+        source='recipeingredient_set'
+    )
+
+    class Meta:
+        model = Recipe
+        fields = CARD_FIELDS
+
+    def get_tags(self, obj):
+        return TagSerializer(
+            tag_bits.tags_for_mask(obj.tags_mask), many=True
+        ).data
+
+
+def _ordered(item, keys):
+    return {key: item[key] for key in keys}
+
+
+class CardField(serializers.Field):
+    """
+    Field read from the card of the recipe. The keys of the stored
+    objects are put back in serializer order, as JSONB does not keep it.
+    """
+
+    def __init__(self, keys, **kwargs):
+        self.keys = keys
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        return [
+            _ordered(item, self.keys)
+            for item in recipe.card.data[self.field_name]
+        ]
+
+
+class CardAuthorField(CardField):
+    """Author read from the card, with the subscription flag added."""
+
+    def to_representation(self, recipe):
+        author = recipe.card.data[self.field_name]
+        return _ordered(
+            {
+                **author,
+                'is_subscribed': is_subscribed(
+                    self.context, User(id=author['id'])
+                ),
+            },
+            self.keys
+        )
+
+
+class RecipeCardSerializer(RecipeListSerializer):
+    """
+    Serializer for retrieving recipes from their cards.
+    Gives the same output as RecipeListSerializer. Recipes without a
+    card yet are rendered from their relations.
+    """
+
+    tags = CardField(TagSerializer.Meta.fields)
+    author = CardAuthorField(UserSerializer.Meta.fields)
+    ingredients = CardField(RecipeIngredientSerializer.Meta.fields)
+
+    def to_representation(self, instance):
+        if self.fields.keys() & set(CARD_FIELDS) and not hasattr(
+            instance, 'card'
+        ):
+            instance.card = RecipeCard(
+                recipe=instance, data=CardDataSerializer(instance).data
+            )
+        return super().to_representation(instance)
+
+
+@transaction.atomic
+def rebuild(recipe_ids):
+    """Render and store the cards of the recipes."""
+    recipes = Recipe.objects.filter(pk__in=recipe_ids).only(
+        'id', 'author', 'tags_mask'
+    ).select_related('author').prefetch_related(
+        'recipeingredient_set__ingredient'
+    )
+    data = CardDataSerializer(recipes, many=True).data
+    cards = [
+        RecipeCard(recipe=recipe, data=item)
+        for recipe, item in zip(recipes, data)
+    ]
+    RecipeCard.objects.filter(recipe_id__in=recipe_ids).delete()
+    RecipeCard.objects.bulk_create(cards)
+
+
+def rebuild_in_batches(recipe_ids, batch_size=500):
+    """Rebuild the cards of the recipes, batch by batch."""
+    recipe_ids = iter(recipe_ids)
+    count = 0
+    while True:
+        batch = list(islice(recipe_ids, batch_size))
+        if not batch:
+            return count
+        rebuild(batch)
+        count += len(batch)
+
+
+def rebuild_all(batch_size=500):
+    """Rebuild every card. Returns the number of cards."""
+    return rebuild_in_batches(
+        Recipe.objects.values_list('id', flat=True).order_by('id').iterator(),
+        batch_size
+    )
+
+
+def recipe_ids_for_author(user_id):
+    return list(Recipe.objects.filter(
+        author_id=user_id
+    ).values_list('id', flat=True))
+
+
+def recipe_ids_for_ingredient(ingredient_id):
+    return list(RecipeIngredient.objects.filter(
+        ingredient_id=ingredient_id
+    ).values_list('recipe_id', flat=True).distinct().order_by())
+
+
+def recipe_ids_for_tag(tag_id):
+    return list(Recipe.tags.through.objects.filter(
+        tag_id=tag_id
+    ).values_list('recipe_id', flat=True))
+
+
+def rebuild_and_purge(recipe_ids, *keys):
+    """
+    Rebuild the cards of the recipes, then purge the cached responses with
+    the surrogate keys, which could have been cached with the old cards.
+    """
+    rebuild_in_batches(recipe_ids)
+    purge_later(*keys)
+
+
+def rebuild_for_ingredient(ingredient_id):
+    rebuild_and_purge(recipe_ids_for_ingredient(ingredient_id), 'ingredients')
+
+
+def rebuild_for_tag(tag_id):
+    rebuild_and_purge(recipe_ids_for_tag(tag_id), 'tags')
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """Throttles and replica pins need a cache every process shares."""
+    backend = settings.CACHES['default']['BACKEND']
+    if settings.DEBUG or backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        f'The default cache {backend} is not shared between processes.',
+        hint=(
+            'Set REDIS_URL or use DatabaseCache, otherwise every worker '
+            'allows the full throttle rates and replica pins are lost.'
+        ),
+        id='api.W001',
+    )]
@@ -0,0 +1,61 @@
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.utils.http import parse_etags
+
+from api.fieldsets import requested_fields
+from api.serializers import (
+    RecipeListSerializer,
+    is_subscribed,
+    user_recipe_ids
+)
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+def _card_updated_at(recipe):
+    """Return when the card was rebuilt, if it was loaded with the recipe."""
+    if not Recipe.card.related.is_cached(recipe):
+        return None
+    card = getattr(recipe, 'card', None)
+    return card and card.updated_at
+
+
+def recipes_etag(recipes, context, *extra):
+    """
+    Return a weak ETag for recipes as the request user sees them.
+    It changes with the recipe and card versions, the favorite, cart
+    and subscription flags of the user and the fields selected with
+    ?fields= and ?omit=, so it is computed without serializing the
+    recipes.
+    """
+    favorites = user_recipe_ids(context, 'favorites')
+    cart = user_recipe_ids(context, 'shopping_cart_recipes')
+    digest = hashlib.sha1()
+    fields = requested_fields(
+        context.get('request'), RecipeListSerializer.Meta.fields
+    )
+    digest.update(f'{",".join(sorted(fields))};'.encode())
+    for value in extra:
+        digest.update(f'{value};'.encode())
+    for recipe in recipes:
+        digest.update((
+            f'{recipe.id}:{recipe.updated_at.isoformat()}:'
+            f'{_card_updated_at(recipe)}:'
+            f'{recipe.id in favorites:d}{recipe.id in cart:d}'
+            f'{is_subscribed(context, User(id=recipe.author_id)):d};'
+        ).encode())
+    return f'W/"{digest.hexdigest()}"'
+
+
+def not_modified(request, etag):
+    """Check If-None-Match against an ETag with the weak comparison."""
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    if '*' in etags:
+        return True
+    opaque = etag.removeprefix('W/')
+    return any(tag.removeprefix('W/') == opaque for tag in etags)
@@ -0,0 +1,53 @@
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def _parse(request, param):
+    value = request.query_params.get(param)
+    if not value:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def reads_only(method, view, action):
+    """
+    Tell whether a request only reads: it uses a safe method or calls one
+    of the read_only_actions of its viewset.
+    """
+    return method in SAFE_METHODS or action in getattr(
+        view, 'read_only_actions', ()
+    )
+
+
+def requested_fields(request, available):
+    """
+    Return the names among available that the client asked for
+    with the ?fields= and ?omit= query parameters of reading requests.
+    The id is always returned.
+    """
+    view = (getattr(request, 'parser_context', None) or {}).get('view')
+    if request is None or not reads_only(
+        request.method, view, getattr(view, 'action', None)
+    ):
+        return set(available)
+    fields = _parse(request, FIELDS_PARAM)
+    omit = _parse(request, OMIT_PARAM) or set()
+    selected = set(available) if fields is None else fields | {'id'}
+    return {
+        name for name in available
+        if name in selected and (name == 'id' or name not in omit)
+    }
+
+
+class SparseFieldsetMixin:
+    """Serializer mixin dropping the fields excluded by the query string."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = requested_fields(
+            self.context.get('request'), self.fields.keys()
+        )
+        for name in set(self.fields.keys()) - selected:
+            self.fields.pop(name)
@@ -1,7 +1,9 @@
+from django.db.models import Case, F, IntegerField, When
 from django_filters import rest_framework as filters
 from rest_framework.filters import SearchFilter
 
-from recipes.models import Recipe, Tag
+from recipes import ingredient_search, tag_bits
+from recipes.models import Recipe
 from users.models import User
 
 
@@ -9,16 +11,34 @@ class IngredientSearchFilter(SearchFilter):
     """
     Filter class for ingredient search.
     Uses the 'name' parameter for searching.
+    With fuzzy=true, names are looked up in the in-memory trigram index,
+    which tolerates typos and word endings, and ranked by similarity.
     """
 
     search_param = 'name'
+    fuzzy_param = 'fuzzy'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        fuzzy = request.query_params.get(self.fuzzy_param, '').lower()
+        if not query or fuzzy not in ('1', 'true'):
+            return super().filter_queryset(request, queryset, view)
+        ids = ingredient_search.search(query)
+        if not ids:
+            return queryset.none()
+        return queryset.filter(id__in=ids).order_by(Case(
+            *(When(id=pk, then=position) for position, pk in enumerate(ids)),
+            output_field=IntegerField()
+        ))
 
 
 class RecipeFilter(filters.FilterSet):
     """
     Class for filtering recipes.
     Allows filtering recipes by favorites,
-    presence in shopping cart, author, and tags.
+    presence in shopping cart, author, tags,
+    calorie, protein and cost ranges.
+    Tags are matched against the tag bits stored on the recipe.
     """
 
     is_favorited = filters.BooleanFilter(
@@ -28,16 +48,26 @@ class RecipeFilter(filters.FilterSet):
         method='recipe_is_in_shopping_cart'
     )
     author = filters.ModelChoiceFilter(queryset=User.objects.all())
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
+    tags = filters.MultipleChoiceFilter(
+        method='recipe_has_tags',
+        choices=tag_bits.slug_choices,
+    )
+    min_kcal = filters.NumberFilter(field_name='kcal', lookup_expr='gte')
+    max_kcal = filters.NumberFilter(field_name='kcal', lookup_expr='lte')
+    min_protein = filters.NumberFilter(
+        field_name='protein', lookup_expr='gte'
     )
+    max_cost = filters.NumberFilter(field_name='cost', lookup_expr='lte')
 
     class Meta:
         model = Recipe
         fields = ('tags', 'author',)
 
+    def recipe_has_tags(self, queryset, name, value):
+        return queryset.alias(
+            tag_match=F('tags_mask').bitand(tag_bits.mask_for_slugs(value))
+        ).filter(tag_match__gt=0)
+
     def recipe_is_favorited(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
             return queryset.filter(favorites__user=self.request.user)
@@ -0,0 +1,118 @@
+import hashlib
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.db import DatabaseError, connections
+
+_current_recorder = ContextVar('query_recorder', default=None)
+
+_IN_LIST_RE = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Return a short fingerprint of a query, ignoring IN list lengths."""
+    normalized = _WHITESPACE_RE.sub(' ', _IN_LIST_RE.sub('(...)', sql))
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12]
+
+
+def get_current_recorder():
+    """Return the recorder of the request being processed, if any."""
+    return _current_recorder.get()
+
+
+class QueryRecorder:
+    """
+    Execute wrapper collecting query and serializer timings of a request.
+    """
+
+    def __init__(self):
+        self.query_count = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.queries = []
+        self.fingerprints = Counter()
+        self._serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.query_count += 1
+            self.db_time += duration
+            self.fingerprints[fingerprint(sql)] += 1
+            self.queries.append(
+                (duration, context['connection'].alias, sql, params, many)
+            )
+
+    @contextmanager
+    def record(self):
+        """Install the recorder on every configured database connection."""
+        token = _current_recorder.set(self)
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(self)
+                    )
+                yield self
+        finally:
+            _current_recorder.reset(token)
+
+    @contextmanager
+    def serializing(self):
+        """Time serialization, counting nested serializers only once."""
+        self._serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._serializer_depth -= 1
+            if not self._serializer_depth:
+                self.serializer_time += time.perf_counter() - start
+
+    @property
+    def duplicates(self):
+        return {
+            key: count for key, count in self.fingerprints.items()
+            if count > 1
+        }
+
+    def slowest_query(self):
+        if not self.queries:
+            return None
+        return max(self.queries, key=lambda query: query[0])
+
+    def explain(self, query):
+        """Return the EXPLAIN output of a captured SELECT query."""
+        duration, alias, sql, params, many = query
+        if many or not sql.lstrip().upper().startswith('SELECT'):
+            return None
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'{connection.ops.explain_query_prefix()} {sql}', params
+                )
+                return '\n'.join(
+                    ' '.join(str(column) for column in row)
+                    for row in cursor.fetchall()
+                )
+        except DatabaseError as error:
+            return f'EXPLAIN failed: {error}'
+
+
+class TimedRepresentationMixin:
+    """Serializer mixin adding its rendering time to the request timings."""
+
+    def to_representation(self, instance):
+        recorder = get_current_recorder()
+        if recorder is None:
+            return super().to_representation(instance)
+        with recorder.serializing():
+            return super().to_representation(instance)
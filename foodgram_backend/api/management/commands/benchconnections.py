@@ -0,0 +1,63 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Measuring the per-request cost of opening database connections '
+        'compared to persistent and pooled connections.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        iterations = options['iterations']
+
+        def new_connection():
+            raw = connection.Database.connect(
+                **connection.get_connection_params()
+            )
+            cursor = raw.cursor()
+            cursor.execute('SELECT 1')
+            cursor.close()
+            raw.close()
+
+        def persistent_connection():
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+
+        def pooled_connection():
+            connection.close()
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+
+        modes = [
+            ('new connection', new_connection),
+            ('persistent', persistent_connection),
+        ]
+        pool = getattr(connection, 'pool', None)
+        if pool is not None:
+            modes.append(('pooled', pooled_connection))
+
+        for name, run in modes:
+            run()
+            timings = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            self.stdout.write(
+                f'{name:>15}: mean {statistics.mean(timings):.3f} ms, '
+                f'p50 {timings[len(timings) // 2]:.3f} ms, '
+                f'p95 {timings[int(len(timings) * 0.95)]:.3f} ms'
+            )
+
+        if pool is not None:
+            self.stdout.write(f'Pool statistics: {pool.snapshot()}')
@@ -0,0 +1,226 @@
+import json
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from urllib.parse import urlencode, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Frontend flows and how often a virtual user goes through each.
+FLOWS = {
+    'browse': 50,
+    'open': 25,
+    'toggle_favorite': 10,
+    'feed': 10,
+    'download_cart': 5,
+}
+
+
+def percentile(values, share):
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Client:
+    """
+    Virtual user keeping one connection to the API and the status and
+    duration of each request by route name.
+    """
+
+    def __init__(self, url, timeout):
+        parts = urlsplit(url)
+        self.connection_class = (
+            HTTPSConnection if parts.scheme == 'https' else HTTPConnection
+        )
+        self.host = parts.netloc
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.connection = None
+        self.headers = {'Accept': 'application/json'}
+        self.results = defaultdict(list)
+
+    def request(self, route, method, path, body=None):
+        """Send a request and return its decoded JSON body, if any."""
+        headers = dict(self.headers)
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        if self.connection is None:
+            self.connection = self.connection_class(
+                self.host, timeout=self.timeout
+            )
+        start = time.perf_counter()
+        try:
+            self.connection.request(method, self.prefix + path, data, headers)
+            response = self.connection.getresponse()
+            payload = response.read()
+            status = response.status
+        except (OSError, HTTPException):
+            self.connection.close()
+            self.connection = None
+            payload, status = b'', None
+        self.results[route].append((status, time.perf_counter() - start))
+        if (
+            status is not None and 200 <= status < 300 and payload
+            and 'json' in response.getheader('Content-Type', '')
+        ):
+            return json.loads(payload)
+        return None
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Replaying frontend flows against a running API with concurrent '
+        'virtual users logged in as seeddemo users, and reporting '
+        'throughput and latency percentiles by route.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000/api')
+        parser.add_argument(
+            '--concurrency', type=int, default=10,
+            help='Number of virtual users running at once.'
+        )
+        parser.add_argument(
+            '--duration', type=float, default=60,
+            help='Seconds to run for.'
+        )
+        parser.add_argument('--think-time', type=float, default=0)
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--prefix', default='demo')
+        parser.add_argument('--password', default='demo-password')
+        parser.add_argument(
+            '--accounts', type=int, default=100,
+            help='Number of seeddemo users to log in as.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.options = options
+        setup = Client(options['url'], options['timeout'])
+        tags = setup.request('tags-list', 'GET', '/tags/')
+        recipes = setup.request(
+            'recipes-list', 'GET', '/recipes/?' + urlencode({'limit': 100})
+        )
+        setup.close()
+        if tags is None or not recipes or not recipes['results']:
+            raise CommandError(
+                f'No recipes at {options["url"]}, is the server running '
+                f'and seeded with seeddemo?'
+            )
+        self.tag_slugs = [tag['slug'] for tag in tags]
+        self.recipe_ids = [recipe['id'] for recipe in recipes['results']]
+        self.pages = max(1, recipes['count'] // 6)
+
+        self.stdout.write(
+            f'Running {options["concurrency"]} virtual users for '
+            f'{options["duration"]:.0f} s against {options["url"]}'
+        )
+        start = time.perf_counter()
+        self.deadline = start + options['duration']
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            clients = list(executor.map(
+                self.run_user, range(options['concurrency'])
+            ))
+        self.report(clients, time.perf_counter() - start)
+
+    def run_user(self, number):
+        options = self.options
+        generator = random.Random(f'{options["seed"]}-{number}')
+        client = Client(options['url'], options['timeout'])
+        account = generator.randrange(options['accounts'])
+        token = client.request(
+            'login', 'POST', '/auth/token/login/',
+            {
+                'email': f'{options["prefix"]}-{account}@demo.local',
+                'password': options['password'],
+            }
+        )
+        if token is not None:
+            client.headers['Authorization'] = f'Token {token["auth_token"]}'
+        recipe_ids = list(self.recipe_ids)
+        flows, weights = zip(*FLOWS.items())
+        while time.perf_counter() < self.deadline:
+            flow = generator.choices(flows, weights)[0]
+            getattr(self, flow)(client, generator, recipe_ids)
+            if options['think_time']:
+                time.sleep(generator.expovariate(1 / options['think_time']))
+        client.close()
+        return client
+
+    def browse(self, client, generator, recipe_ids):
+        query = [('page', generator.randint(1, min(self.pages, 20)))]
+        query.extend(
+            ('tags', slug) for slug in generator.sample(
+                self.tag_slugs,
+                min(len(self.tag_slugs), generator.choice((0, 1, 1, 2)))
+            )
+        )
+        page = client.request(
+            'recipes-list', 'GET', '/recipes/?' + urlencode(query)
+        )
+        if page is not None:
+            recipe_ids.extend(recipe['id'] for recipe in page['results'])
+            del recipe_ids[:-1000]
+
+    def open(self, client, generator, recipe_ids):
+        client.request(
+            'recipes-detail', 'GET',
+            f'/recipes/{generator.choice(recipe_ids)}/'
+        )
+
+    def toggle_favorite(self, client, generator, recipe_ids):
+        path = f'/recipes/{generator.choice(recipe_ids)}/favorite/'
+        client.request('recipes-favorite', 'POST', path)
+        client.request('recipes-favorite', 'DELETE', path)
+
+    def feed(self, client, generator, recipe_ids):
+        client.request('recipes-feed', 'GET', '/recipes/feed/?limit=6')
+
+    def download_cart(self, client, generator, recipe_ids):
+        client.request(
+            'recipes-download-shopping-cart', 'GET',
+            '/recipes/download_shopping_cart/'
+        )
+
+    def report(self, clients, elapsed):
+        results = defaultdict(list)
+        for client in clients:
+            for route, route_results in client.results.items():
+                results[route].extend(route_results)
+        results['total'] = [
+            result for route, route_results in list(results.items())
+            if route != 'login' for result in route_results
+        ]
+        self.stdout.write(
+            f'{"route":<32}{"requests":>9}{"rps":>8}{"errors":>8}'
+            f'{"429":>6}{"p50 ms":>9}{"p90 ms":>9}{"p99 ms":>9}'
+            f'{"max ms":>9}'
+        )
+        for route, route_results in sorted(
+            results.items(), key=lambda item: item[0] == 'total'
+        ):
+            durations = sorted(
+                duration * 1000 for _, duration in route_results
+            )
+            if not durations:
+                continue
+            statuses = [status for status, _ in route_results]
+            errors = sum(
+                status is None or status >= 500 for status in statuses
+            )
+            self.stdout.write(
+                f'{route:<32}{len(durations):>9}'
+                f'{len(durations) / elapsed:>8.1f}{errors:>8}'
+                f'{statuses.count(429):>6}'
+                f'{percentile(durations, 0.5):>9.1f}'
+                f'{percentile(durations, 0.9):>9.1f}'
+                f'{percentile(durations, 0.99):>9.1f}'
+                f'{durations[-1]:>9.1f}'
+            )
@@ -0,0 +1,138 @@
+import io
+import pstats
+import statistics
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import profiling
+
+
+class Command(BaseCommand):
+    help = (
+        'Summarizing the request profiles stored by ProfilingMiddleware '
+        'by view and action, showing one of them, or printing a value of '
+        'the X-Profile header to profile a request with.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--token', action='store_true',
+            help='Print a value of the X-Profile header.'
+        )
+        parser.add_argument('--view')
+        parser.add_argument('--action')
+        parser.add_argument(
+            '--show', metavar='ID',
+            help='Print the slowest functions and queries of a profile.'
+        )
+        parser.add_argument('--top', type=int, default=25)
+        parser.add_argument(
+            '--keep', type=int,
+            help='Delete all profiles but the newest ones.'
+        )
+
+    def handle(self, *args, **options):
+        if options['token']:
+            self.stdout.write(
+                f'{profiling.PROFILE_HEADER}: {profiling.make_token()}'
+            )
+            return
+        if not settings.PROFILING_DIR:
+            raise CommandError('PROFILING_DIR is not set.')
+        profiles = profiling.load_meta()
+        if options['keep'] is not None:
+            self.prune(profiles, options['keep'])
+        elif options['show']:
+            self.show(profiles, options['show'], options['top'])
+        else:
+            self.summarize([
+                meta for meta in profiles
+                if options['view'] in (None, meta['view'])
+                and options['action'] in (None, meta['action'])
+            ])
+
+    def summarize(self, profiles):
+        groups = defaultdict(list)
+        for meta in profiles:
+            groups[(meta['view'], meta['action'])].append(meta)
+        self.stdout.write(
+            f'{"view":<24}{"action":<24}{"count":>6}{"mean ms":>9}'
+            f'{"max ms":>9}{"db ms":>8}{"queries":>8}'
+        )
+        for (view, action), metas in sorted(
+            groups.items(),
+            key=lambda item: -statistics.mean(
+                meta['total_ms'] for meta in item[1]
+            )
+        ):
+            self.stdout.write(
+                f'{view or "-":<24}{action or "-":<24}{len(metas):>6}'
+                f'{statistics.mean(m["total_ms"] for m in metas):>9.1f}'
+                f'{max(m["total_ms"] for m in metas):>9.1f}'
+                f'{statistics.mean(m["db_ms"] for m in metas):>8.1f}'
+                f'{statistics.mean(len(m["queries"]) for m in metas):>8.1f}'
+            )
+        self.stdout.write('\nSlowest profiles:')
+        for meta in sorted(profiles, key=lambda meta: -meta['total_ms'])[:10]:
+            self.stdout.write(
+                f'{meta["id"]}  {meta["total_ms"]:.1f} ms  '
+                f'{meta["method"]} {meta["path"]}'
+            )
+
+    def show(self, profiles, profile_id, top):
+        meta = next(
+            (meta for meta in profiles if meta['id'] == profile_id), None
+        )
+        if meta is None:
+            raise CommandError(f'No profile {profile_id}.')
+        self.stdout.write(
+            f'{meta["method"]} {meta["path"]} -> {meta["status"]} in '
+            f'{meta["total_ms"]:.1f} ms, {len(meta["queries"])} queries in '
+            f'{meta["db_ms"]:.1f} ms ({meta["trigger"]}, {meta["mode"]})\n'
+        )
+        path = Path(settings.PROFILING_DIR) / meta['profile']
+        if meta['mode'] == 'sampler':
+            self.show_samples(path, top)
+        else:
+            # pstats writes lines in pieces, which OutputWrapper breaks up.
+            output = io.StringIO()
+            pstats.Stats(str(path), stream=output).strip_dirs(
+            ).sort_stats('cumulative').print_stats(top)
+            self.stdout.write(output.getvalue())
+        self.stdout.write('Slowest queries:')
+        for query in sorted(meta['queries'], key=lambda query: -query['ms'])[
+            :10
+        ]:
+            self.stdout.write(f'{query["ms"]:>9.2f} ms  {query["sql"]}')
+
+    def show_samples(self, path, top):
+        """Print the functions found in most samples, with own samples."""
+        total = Counter()
+        own = Counter()
+        samples = 0
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                stack, count = line.rsplit(' ', 1)
+                frames = stack.split(';')
+                count = int(count)
+                samples += count
+                own[frames[-1]] += count
+                for frame in set(frames):
+                    total[frame] += count
+        self.stdout.write(f'{samples} samples\n{"total":>7}{"own":>7}')
+        for frame, count in total.most_common(top):
+            self.stdout.write(f'{count:>7}{own[frame]:>7}  {frame}')
+        self.stdout.write('')
+
+    def prune(self, profiles, keep):
+        directory = Path(settings.PROFILING_DIR)
+        stale = profiles[:max(0, len(profiles) - keep)]
+        for meta in stale:
+            (directory / meta['profile']).unlink(missing_ok=True)
+            (directory / f'{meta["id"]}.json').unlink(missing_ok=True)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(stale)} profiles deleted'
+        ))
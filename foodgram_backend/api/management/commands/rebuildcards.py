@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import cards
+
+
+class Command(BaseCommand):
+    help = 'Rebuilding the stored cards of every recipe.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = cards.rebuild_all(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Cards rebuilt for {count} recipes '
+            f'in {time.perf_counter() - start:.1f} s'
+        ))
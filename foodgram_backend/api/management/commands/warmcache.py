@@ -0,0 +1,78 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from recipes.models import Recipe, Tag
+
+# Page size of the recipe lists of the frontend.
+PAGE_SIZE = 6
+
+
+class Command(BaseCommand):
+    help = (
+        'Warming the proxy cache with the anonymous API responses read '
+        'most, requested through the proxy with the query strings the '
+        'frontend sends.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1/api')
+        parser.add_argument(
+            '--pages', type=int, default=5,
+            help='Number of pages of each recipe list.'
+        )
+        parser.add_argument(
+            '--recipes', type=int, default=100,
+            help='Number of the most favorited recipes to open.'
+        )
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def handle(self, *args, **options):
+        self.options = options
+        url = options['url'].rstrip('/')
+        paths = ['/tags/', '/ingredients/']
+        slugs = list(Tag.objects.values_list('slug', flat=True))
+        # The main page starts with every tag selected, in the API order.
+        filters = ['', ''.join(f'&tags={slug}' for slug in slugs)]
+        filters.extend(f'&tags={slug}' for slug in slugs)
+        for page in range(1, options['pages'] + 1):
+            paths.extend(
+                f'/recipes/?page={page}&limit={PAGE_SIZE}{tags}'
+                for tags in filters
+            )
+        recipe_ids = Recipe.objects.annotate(
+            favorites_count=Count('favorites')
+        ).order_by('-favorites_count', '-pub_date').values_list(
+            'id', flat=True
+        )[:options['recipes']]
+        paths.extend(f'/recipes/{pk}/' for pk in recipe_ids)
+
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            results = Counter(executor.map(
+                self.fetch, (url + path for path in paths)
+            ))
+        for result, count in results.most_common():
+            self.stdout.write(f'{count:>6}  {result}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(paths)} responses requested'
+        ))
+
+    def fetch(self, url):
+        """Return the status and the proxy cache status of a response."""
+        request = Request(url, headers={'Accept': 'application/json'})
+        try:
+            with urlopen(request, timeout=self.options['timeout']) as response:
+                response.read()
+                return (
+                    f'{response.status} '
+                    f'{response.headers.get("X-Cache-Status", "no proxy")}'
+                )
+        except HTTPError as error:
+            return f'{error.code} {error.headers.get("X-Cache-Status", "")}'
+        except URLError as error:
+            return f'error {error.reason}'
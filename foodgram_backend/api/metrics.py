@@ -0,0 +1,92 @@
+import os
+
+from django.db import connections
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+
+# Cache lookups are counted where the caches live, outside the api app.
+from foodgram_backend.cache_metrics import observe_cache  # noqa: F401
+from foodgram_backend.db_backends.postgresql.pool import pool_stats
+
+REQUESTS = Counter(
+    'foodgram_http_requests_total',
+    'Number of processed requests.',
+    ('route', 'method', 'status'),
+)
+LATENCY = Histogram(
+    'foodgram_http_request_duration_seconds',
+    'Request processing time.',
+    ('route', 'method'),
+    buckets=(
+        0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+    ),
+)
+DB_QUERIES = Histogram(
+    'foodgram_db_queries_per_request',
+    'Number of database queries run by a request.',
+    ('route',),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 250),
+)
+DB_TIME = Histogram(
+    'foodgram_db_duration_seconds',
+    'Time spent in the database by a request.',
+    ('route',),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+DB_CONNECTIONS = Gauge(
+    'foodgram_db_connections',
+    'Database connections held by the workers.',
+    ('alias', 'state'),
+    multiprocess_mode='livesum',
+)
+DB_POOL = Gauge(
+    'foodgram_db_pool',
+    'Connection pool statistics of the workers.',
+    ('alias', 'stat'),
+    multiprocess_mode='livesum',
+)
+
+
+def observe_request(route, method, status, duration, recorder=None):
+    """Record the outcome of a processed request."""
+    REQUESTS.labels(route, method, status).inc()
+    LATENCY.labels(route, method).observe(duration)
+    if recorder is not None:
+        DB_QUERIES.labels(route).observe(recorder.query_count)
+        DB_TIME.labels(route).observe(recorder.db_time)
+
+
+def update_connection_gauges():
+    """Publish the connections this worker currently keeps open."""
+    for alias in connections:
+        wrapper = connections[alias]
+        DB_CONNECTIONS.labels(alias, 'open').set(
+            int(wrapper.connection is not None)
+        )
+        DB_CONNECTIONS.labels(alias, 'in_transaction').set(
+            int(wrapper.in_atomic_block)
+        )
+    for alias, stats in pool_stats().items():
+        for stat, value in stats.items():
+            DB_POOL.labels(alias, stat).set(value)
+
+
+def render():
+    """
+    Return the metrics in the Prometheus text format.
+    Under gunicorn the values of all workers are merged from
+    PROMETHEUS_MULTIPROC_DIR.
+    """
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
@@ -0,0 +1,266 @@
+import cProfile
+import hashlib
+import json
+import logging
+import random
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import Resolver404, resolve
+from rest_framework.permissions import SAFE_METHODS
+
+from api import metrics, profiling
+from api.fieldsets import reads_only
+from api.instrumentation import QueryRecorder, get_current_recorder
+from foodgram_backend.db_router import use_primary
+
+logger = logging.getLogger('foodgram.performance')
+
+
+class MetricsMiddleware:
+    """
+    Middleware recording request counts and latencies per DRF route.
+    Must be placed before QueryTimingMiddleware to see its query counts.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        match = request.resolver_match
+        metrics.observe_request(
+            route=match.url_name if match else 'unmatched',
+            method=request.method,
+            status=response.status_code,
+            duration=time.perf_counter() - start,
+            recorder=getattr(request, 'query_recorder', None),
+        )
+        metrics.update_connection_gauges()
+        return response
+
+
+class QueryTimingMiddleware:
+    """
+    Middleware measuring database and serializer time of every request.
+    Adds a Server-Timing header, logs a sample of requests and reports
+    slow requests together with their slowest query and its plan.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.QUERY_TIMING_ENABLED:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with recorder.record():
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - start) * 1000
+        request.query_recorder = recorder
+
+        response['Server-Timing'] = self.server_timing(recorder, total_ms)
+
+        slow = total_ms >= settings.SLOW_REQUEST_THRESHOLD_MS
+        if slow or random.random() < settings.QUERY_TIMING_SAMPLE_RATE:
+            self.log(request, response, recorder, total_ms, slow)
+        return response
+
+    @staticmethod
+    def server_timing(recorder, total_ms):
+        return ', '.join((
+            f'db;dur={recorder.db_time * 1000:.1f};'
+            f'desc="{recorder.query_count} queries"',
+            f'serializer;dur={recorder.serializer_time * 1000:.1f}',
+            f'total;dur={total_ms:.1f}',
+        ))
+
+    @staticmethod
+    def log(request, response, recorder, total_ms, slow):
+        match = request.resolver_match
+        payload = {
+            'method': request.method,
+            'path': request.path,
+            'route': match.url_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 1),
+            'db_ms': round(recorder.db_time * 1000, 1),
+            'serializer_ms': round(recorder.serializer_time * 1000, 1),
+            'queries': recorder.query_count,
+            'duplicate_queries': recorder.duplicates,
+        }
+        if not slow:
+            logger.info(json.dumps(payload, ensure_ascii=False))
+            return
+
+        slowest = recorder.slowest_query()
+        if slowest is not None:
+            payload['slowest_query'] = {
+                'ms': round(slowest[0] * 1000, 1),
+                'sql': slowest[2],
+                'plan': recorder.explain(slowest),
+            }
+        logger.warning(json.dumps(payload, default=str, ensure_ascii=False))
+
+
+class ProfilingMiddleware:
+    """
+    Middleware profiling requests sent with a valid X-Profile header and
+    a PROFILING_SAMPLE_RATE share of the others. The profile, by cProfile
+    or by a stack sampler as set in PROFILING_MODE, is stored in
+    PROFILING_DIR with the SQL of the request, and its id is returned in
+    the X-Profile-Id header. Unused when PROFILING_DIR is not set.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_DIR:
+            raise MiddlewareNotUsed
+        Path(settings.PROFILING_DIR).mkdir(parents=True, exist_ok=True)
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = request.headers.get(profiling.PROFILE_HEADER)
+        if token is not None:
+            trigger = 'header' if profiling.valid_token(token) else None
+        elif random.random() < settings.PROFILING_SAMPLE_RATE:
+            trigger = 'sample'
+        else:
+            trigger = None
+        if trigger is None:
+            return self.get_response(request)
+
+        recorder = get_current_recorder()
+        if recorder is None:
+            recorder = QueryRecorder()
+            with recorder.record():
+                return self.profile(request, trigger, recorder, 0)
+        return self.profile(request, trigger, recorder, len(recorder.queries))
+
+    def profile(self, request, trigger, recorder, first_query):
+        mode = settings.PROFILING_MODE
+        start = time.perf_counter()
+        if mode == 'sampler':
+            with profiling.StackSampler(
+                settings.PROFILING_SAMPLER_INTERVAL
+            ) as profiler:
+                response = self.get_response(request)
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        total_ms = (time.perf_counter() - start) * 1000
+
+        match = request.resolver_match
+        route = match.url_name if match and match.url_name else 'unmatched'
+        view = getattr(match.func, 'cls', match.func) if match else None
+        actions = getattr(match.func, 'actions', None) if match else None
+        profile_id = profiling.new_profile_id(route)
+        directory = Path(settings.PROFILING_DIR)
+        if mode == 'sampler':
+            profile_file = f'{profile_id}.folded'
+            profiler.dump(directory / profile_file)
+        else:
+            profile_file = f'{profile_id}.prof'
+            profiler.dump_stats(directory / profile_file)
+        queries = recorder.queries[first_query:]
+        profiling.save_meta(profile_id, {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'route': route,
+            'view': view.__name__ if view else None,
+            'action': (
+                actions.get(request.method.lower()) if actions else None
+            ),
+            'status': response.status_code,
+            'trigger': trigger,
+            'mode': mode,
+            'profile': profile_file,
+            'total_ms': round(total_ms, 1),
+            'db_ms': round(
+                sum(query[0] for query in queries) * 1000, 1
+            ),
+            # Without params, which hold tokens, emails and password hashes.
+            'queries': [
+                {'ms': round(duration * 1000, 2), 'alias': alias, 'sql': sql}
+                for duration, alias, sql, _, _ in queries
+            ],
+        })
+        response['X-Profile-Id'] = profile_id
+        return response
+
+
+class ReplicaPinningMiddleware:
+    """
+    Middleware giving clients read-your-writes consistency with replicas.
+    Write requests run on the primary and pin the client to it for
+    REPLICA_PIN_SECONDS, through a cookie and a key derived from its
+    credentials in the shared cache, so its next reads see what it has
+    just written whichever worker serves them. Actions listed in the
+    read_only_actions of a viewset are reads whatever their method.
+    """
+
+    cookie_name = 'primary_pin'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        key = self.pin_key(request)
+        write = not self.reads_only(request)
+        pinned = write or self.cookie_name in request.COOKIES
+        if not pinned and key is not None:
+            pinned = cache.get(key) is not None
+            metrics.observe_cache('replica_pin', pinned)
+        if not pinned:
+            return self.get_response(request)
+
+        with use_primary():
+            response = self.get_response(request)
+        if write:
+            if key is not None:
+                cache.set(key, 1, settings.REPLICA_PIN_SECONDS)
+            response.set_cookie(
+                self.cookie_name, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+            )
+        return response
+
+    @staticmethod
+    def reads_only(request):
+        """Tell whether a request only reads, before its view runs."""
+        if request.method in SAFE_METHODS:
+            return True
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        actions = getattr(match.func, 'actions', None) or {}
+        return reads_only(
+            request.method,
+            getattr(match.func, 'cls', None),
+            actions.get(request.method.lower())
+        )
+
+    @staticmethod
+    def pin_key(request):
+        credentials = (
+            request.headers.get('Authorization')
+            or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        )
+        if not credentials:
+            return None
+        digest = hashlib.sha1(credentials.encode('utf-8')).hexdigest()
+        return f'primary-pin:{digest}'
@@ -1,4 +1,4 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class CustomPagination(PageNumberPagination):
@@ -6,3 +6,16 @@ class CustomPagination(PageNumberPagination):
 
     page_size_query_param = 'limit'
     page_size = 6
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset paginator walking objects in id order.
+    Enabled with pagination=keyset for clients reading whole tables.
+    """
+
+    query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = 100
+    max_page_size = 1000
+    ordering = 'id'
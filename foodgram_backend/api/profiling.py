@@ -0,0 +1,99 @@
+import json
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+
+PROFILE_HEADER = 'X-Profile'
+
+_SIGNING_SALT = 'api.profiling'
+
+
+def make_token():
+    """Return a value of the profiling header, valid for a while."""
+    return signing.TimestampSigner(salt=_SIGNING_SALT).sign('profile')
+
+
+def valid_token(value):
+    try:
+        signing.TimestampSigner(salt=_SIGNING_SALT).unsign(
+            value, max_age=settings.PROFILING_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def frame_label(code):
+    return f'{code.co_filename}:{code.co_firstlineno}({code.co_name})'
+
+
+class StackSampler:
+    """
+    Statistical profiler sampling the stack of the calling thread every
+    interval seconds from a helper thread. Unlike cProfile it does not
+    slow down every call, at the price of missing short ones.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        # Frames up to the caller are left out of the stacks.
+        self.depth = 0
+        frame = sys._getframe(1)
+        while frame is not None:
+            self.depth += 1
+            frame = frame.f_back
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            stack = stack[::-1][self.depth:]
+            if stack:
+                self.stacks[';'.join(stack)] += 1
+
+    def dump(self, path):
+        """Write the stacks in the folded format read by flame graph tools."""
+        with open(path, 'w', encoding='utf-8') as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f'{stack} {count}\n')
+
+
+def new_profile_id(route):
+    return f'{time.strftime("%Y%m%d-%H%M%S")}-{route}-{uuid.uuid4().hex[:8]}'
+
+
+def save_meta(profile_id, meta):
+    path = Path(settings.PROFILING_DIR) / f'{profile_id}.json'
+    path.write_text(json.dumps(meta, default=str, ensure_ascii=False))
+
+
+def load_meta():
+    """Return the metadata of the stored profiles, oldest first."""
+    profiles = []
+    for path in sorted(Path(settings.PROFILING_DIR).glob('*.json')):
+        try:
+            profiles.append({'id': path.stem, **json.loads(path.read_text())})
+        except (OSError, ValueError):
+            continue
+    return profiles
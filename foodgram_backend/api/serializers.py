@@ -1,16 +1,88 @@
+import base64
+import binascii
+
 from django.conf import settings
+from django.db import transaction
 
 from rest_framework import serializers
 from drf_extra_fields.fields import Base64ImageField
 from django.contrib.auth import get_user_model
 
-from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from api.fieldsets import SparseFieldsetMixin
+from api.instrumentation import TimedRepresentationMixin
+from recipes import images, nutrition, shopping_list, tag_bits
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    Tag
+)
 from users.models import Subscription
 
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+class StoredImageField(Base64ImageField):
+    """
+    Base64 image field storing images by content. Bytes stored before
+    are found by their hash without being decoded as an image again.
+    The validated value is a StoredImage, or an images.Upload for new
+    bytes, stored by images.store_upload once the recipe is saved, so
+    invalid requests leave no file behind.
+    """
+
+    def to_internal_value(self, base64_data):
+        if not isinstance(base64_data, str) or not base64_data:
+            return super().to_internal_value(base64_data)
+        try:
+            content = base64.b64decode(base64_data.split(';base64,')[-1])
+        except (TypeError, binascii.Error, ValueError):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        sha256 = images.digest(content)
+        stored = images.find(sha256)
+        if stored is not None:
+            return stored
+        upload = super().to_internal_value(base64_data)
+        return images.Upload(content, upload.name.rsplit('.', 1)[-1], sha256)
+
+
+def is_subscribed(context, author):
+    """
+    Check whether the request user follows the author.
+    Uses the is_subscribed annotation when the queryset provides it,
+    otherwise the ids of all followed authors, loaded once per request.
+    """
+    if hasattr(author, 'is_subscribed'):
+        return author.is_subscribed
+    request = context.get('request')
+    if request is None or not request.user.is_authenticated:
+        return False
+    user = request.user
+    if 'followed_author_ids' not in context:
+        context['followed_author_ids'] = set(
+            user.subscriptions.values_list('author_id', flat=True)
+        )
+    return author.id in context['followed_author_ids']
+
+
+def user_recipe_ids(context, relation):
+    """
+    Return the ids of the recipes in the favorites or the shopping cart
+    of the request user, loaded once per request.
+    """
+    user = context['request'].user
+    if user.is_anonymous:
+        return set()
+    key = f'{relation}_recipe_ids'
+    if key not in context:
+        context[key] = set(
+            getattr(user, relation).values_list('recipe_id', flat=True)
+        )
+    return context[key]
+
+
+class UserSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     """Serializer for the user model."""
 
     is_subscribed = serializers.SerializerMethodField()
@@ -27,9 +99,7 @@ class UserSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        return user.is_authenticated and user.subscriptions.filter(
-            author=obj).exists()
+        return is_subscribed(self.context, obj)
 
 
 class UserCreateSerializer(serializers.ModelSerializer):
@@ -60,7 +130,7 @@ class UserCreateSerializer(serializers.ModelSerializer):
         return user
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     """Serializer for the tag model."""
 
     class Meta:
@@ -73,7 +143,9 @@ class TagSerializer(serializers.ModelSerializer):
         )
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(
+    TimedRepresentationMixin, serializers.ModelSerializer
+):
     """Serializer for the ingredient model."""
 
     class Meta:
@@ -107,8 +179,15 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         )
 
 
-class RecipeListSerializer(serializers.ModelSerializer):
-    """Serializer for retrieving recipes."""
+class RecipeListSerializer(
+    TimedRepresentationMixin,
+    SparseFieldsetMixin,
+    serializers.ModelSerializer
+):
+    """
+    Serializer for retrieving recipes.
+    Supports sparse fieldsets through the fields and omit parameters.
+    """
 
     ingredients = RecipeIngredientSerializer(
         many=True,
@@ -117,7 +196,7 @@ class RecipeListSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
     author = UserSerializer(read_only=True)
-    tags = TagSerializer(many=True, read_only=True)
+    tags = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Recipe
@@ -130,21 +209,31 @@ class RecipeListSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_width',
+            'image_height',
+            'image_placeholder',
             'text',
             'cooking_time',
+            'kcal',
+            'protein',
+            'fat',
+            'carbs',
+            'cost',
+            'unweighed_ingredients',
         )
 
+    def get_tags(self, obj):
+        return TagSerializer(
+            tag_bits.tags_for_mask(obj.tags_mask), many=True
+        ).data
+
     def get_is_favorited(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return user.favorites.filter(recipe=obj).exists()
+        return obj.id in user_recipe_ids(self.context, 'favorites')
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return user.shopping_cart_recipes.filter(recipe=obj).exists()
+        return obj.id in user_recipe_ids(
+            self.context, 'shopping_cart_recipes'
+        )
 
 
 class IngredientCreateSerializer(serializers.ModelSerializer):
@@ -178,7 +267,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         many=True,
         queryset=Tag.objects.all(),
         required=True)
-    image = Base64ImageField()
+    image = StoredImageField()
     author = UserSerializer(read_only=True)
     cooking_time = serializers.IntegerField(
         min_value=settings.MIN_COOK_TIME,
@@ -277,19 +366,34 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 
         RecipeIngredient.objects.bulk_create(create_ingredients)
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags_data = validated_data.pop('tags')
+        validated_data.update(images.recipe_fields(
+            images.store_upload(validated_data['image'])
+        ))
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags_data)
         self.create_ingredients(recipe, ingredients)
+        nutrition.update_recipe(recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.pop('ingredients', None)
         if ingredients is not None:
+            instance.recipeingredient_set.all().delete()
             self.create_ingredients(instance, ingredients)
-        return super().update(instance, validated_data)
+            shopping_list.rebuild_for_recipe(instance)
+        if 'image' in validated_data:
+            validated_data.update(images.recipe_fields(
+                images.store_upload(validated_data['image'])
+            ))
+        instance = super().update(instance, validated_data)
+        if ingredients is not None:
+            nutrition.update_recipe(instance)
+        return instance
 
     def to_representation(self, instance):
         return RecipeListSerializer(instance, context={
@@ -297,7 +401,37 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         }).data
 
 
-class RecipeForSubscriptionSerializer(serializers.ModelSerializer):
+class ShoppingCartServingsSerializer(serializers.ModelSerializer):
+    """Serializer for the number of servings of a recipe in cart."""
+
+    class Meta:
+        model = ShoppingCart
+        fields = ('servings',)
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Serializer for the recipe ids of a batch request."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.RECIPES_BATCH_MAX_SIZE
+    )
+
+
+class ShoppingListLineSerializer(
+    TimedRepresentationMixin, serializers.Serializer
+):
+    """Serializer for a line of the unit-normalized shopping list."""
+
+    name = serializers.CharField()
+    amount = serializers.FloatField()
+    measurement_unit = serializers.CharField()
+
+
+class RecipeForSubscriptionSerializer(
+    TimedRepresentationMixin, serializers.ModelSerializer
+):
     """Serializer for recipes in favorites and shopping list."""
 
     class Meta:
@@ -310,8 +444,15 @@ class RecipeForSubscriptionSerializer(serializers.ModelSerializer):
         )
 
 
-class SubscriptionsSerializer(serializers.ModelSerializer):
-    """Serializer for displaying user subscriptions."""
+class SubscriptionsSerializer(
+    TimedRepresentationMixin,
+    SparseFieldsetMixin,
+    serializers.ModelSerializer
+):
+    """
+    Serializer for displaying user subscriptions.
+    Supports sparse fieldsets through the fields and omit parameters.
+    """
 
     recipes = serializers.SerializerMethodField()
     recipes_count = serializers.SerializerMethodField()
@@ -331,6 +472,8 @@ class SubscriptionsSerializer(serializers.ModelSerializer):
         )
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.count()
 
     def get_recipes(self, obj):
@@ -346,9 +489,7 @@ class SubscriptionsSerializer(serializers.ModelSerializer):
         ).data
 
     def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        return user.is_authenticated and user.subscriptions.filter(
-            author=obj).exists()
+        return is_subscribed(self.context, obj)
 
 
 class SubscriptionCreateSerializer(serializers.ModelSerializer):
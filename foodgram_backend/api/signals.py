@@ -0,0 +1,97 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from api import cards
+from api.caching import purge_later
+from recipes.background import enqueue
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.signals import recipes_changed, recipes_deleted
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def rebuild_author_cards(sender, instance, created, update_fields,
+                         **kwargs):
+    if created:
+        return
+    if update_fields is not None and not set(update_fields) & set(
+        cards.AUTHOR_FIELDS
+    ):
+        return
+    cards.rebuild_in_batches(cards.recipe_ids_for_author(instance.id))
+    purge_later(f'author-{instance.id}')
+
+
+@receiver(post_save, sender=Ingredient)
+def rebuild_ingredient_cards(sender, instance, created, **kwargs):
+    if not created:
+        enqueue(
+            cards.rebuild_for_ingredient,
+            instance.id,
+            key=f'cards:ingredient:{instance.id}'
+        )
+
+
+@receiver(post_save, sender=Tag)
+def rebuild_tag_cards(sender, instance, created, **kwargs):
+    if not created:
+        enqueue(
+            cards.rebuild_for_tag,
+            instance.id,
+            key=f'cards:tag:{instance.id}'
+        )
+
+
+@receiver(pre_delete, sender=Ingredient)
+def remember_ingredient_cards(sender, instance, **kwargs):
+    instance._card_recipe_ids = cards.recipe_ids_for_ingredient(instance.id)
+
+
+@receiver(pre_delete, sender=Tag)
+def remember_tag_cards(sender, instance, **kwargs):
+    instance._card_recipe_ids = cards.recipe_ids_for_tag(instance.id)
+
+
+@receiver(post_delete, sender=Ingredient)
+def rebuild_ingredient_cards_after_delete(sender, instance, **kwargs):
+    if not instance._card_recipe_ids:
+        return
+    enqueue(cards.rebuild_and_purge, instance._card_recipe_ids, 'ingredients')
+
+
+@receiver(post_delete, sender=Tag)
+def rebuild_tag_cards_after_delete(sender, instance, **kwargs):
+    if not instance._card_recipe_ids:
+        return
+    enqueue(cards.rebuild_and_purge, instance._card_recipe_ids, 'tags')
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def purge_tags(sender, instance, **kwargs):
+    purge_later('tags')
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def purge_ingredients(sender, instance, **kwargs):
+    purge_later('ingredients')
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def purge_recipe(sender, instance, **kwargs):
+    # Not the author key, which would purge every recipe page.
+    purge_later('recipes', f'recipe-{instance.id}')
+
+
+@receiver(recipes_changed)
+def rebuild_changed_cards(sender, recipe_ids, **kwargs):
+    cards.rebuild(recipe_ids)
+
+
+@receiver(recipes_deleted)
+def purge_deleted_recipes(sender, **kwargs):
+    purge_later('recipes')
@@ -0,0 +1,96 @@
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from api.middleware import ReplicaPinningMiddleware
+from foodgram_backend import db_router
+from recipes.models import Recipe
+
+REPLICA = 'replica_0'
+
+
+def routed_read(request):
+    """View answering with the database a read of the request would use."""
+    return HttpResponse(router.db_for_read(Recipe))
+
+
+@skipUnless(
+    REPLICA in settings.DATABASES,
+    'Set DB_REPLICA_HOSTS, the replica mirrors the default test database.'
+)
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRoutingTests(SimpleTestCase):
+    # Not a TestCase: its transaction would keep every read on the primary.
+    # The runner reads databases of skipped classes too, so a missing
+    # replica alias is left out rather than failing the whole run.
+    databases = {'default'} | ({REPLICA} & set(settings.DATABASES))
+
+    def setUp(self):
+        db_router._replica_state.clear()
+        cache.clear()
+        self.factory = RequestFactory()
+        self.middleware = ReplicaPinningMiddleware(routed_read)
+
+    def test_reads_go_to_replica_and_writes_to_primary(self):
+        self.assertEqual(router.db_for_read(Recipe), REPLICA)
+        self.assertEqual(router.db_for_write(Recipe), 'default')
+
+    def test_use_primary_block_reads_primary(self):
+        with db_router.use_primary():
+            self.assertEqual(router.db_for_read(Recipe), 'default')
+        self.assertEqual(router.db_for_read(Recipe), REPLICA)
+
+    def test_atomic_block_reads_primary(self):
+        with transaction.atomic():
+            self.assertEqual(router.db_for_read(Recipe), 'default')
+        self.assertEqual(router.db_for_read(Recipe), REPLICA)
+
+    def test_unhealthy_replica_falls_back_to_primary(self):
+        with mock.patch.object(
+            db_router, 'replica_is_healthy', return_value=False
+        ):
+            self.assertEqual(router.db_for_read(Recipe), 'default')
+
+    def test_write_pins_client_to_primary(self):
+        response = self.middleware(self.factory.post(
+            '/api/recipes/', HTTP_AUTHORIZATION='Token writer'
+        ))
+        self.assertEqual(response.content, b'default')
+        self.assertIn(ReplicaPinningMiddleware.cookie_name, response.cookies)
+
+        # Token clients keep no cookies, the shared cache pins them.
+        response = self.middleware(self.factory.get(
+            '/api/recipes/', HTTP_AUTHORIZATION='Token writer'
+        ))
+        self.assertEqual(response.content, b'default')
+
+        response = self.middleware(self.factory.get(
+            '/api/recipes/', HTTP_AUTHORIZATION='Token reader'
+        ))
+        self.assertEqual(response.content, REPLICA.encode())
+
+    def test_pin_cookie_pins_anonymous_client(self):
+        request = self.factory.get('/api/recipes/')
+        request.COOKIES[ReplicaPinningMiddleware.cookie_name] = '1'
+        self.assertEqual(self.middleware(request).content, b'default')
+        self.assertEqual(
+            self.middleware(self.factory.get('/api/recipes/')).content,
+            REPLICA.encode()
+        )
+
+    def test_read_only_action_does_not_pin(self):
+        response = self.middleware(self.factory.post(
+            '/api/recipes/batch/', HTTP_AUTHORIZATION='Token batcher'
+        ))
+        self.assertEqual(response.content, REPLICA.encode())
+        self.assertNotIn(
+            ReplicaPinningMiddleware.cookie_name, response.cookies
+        )
+        response = self.middleware(self.factory.get(
+            '/api/recipes/', HTTP_AUTHORIZATION='Token batcher'
+        ))
+        self.assertEqual(response.content, REPLICA.encode())
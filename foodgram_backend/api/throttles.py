@@ -0,0 +1,129 @@
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from foodgram_backend.cache_metrics import observe_cache
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+_state = {'pruned_at': 0.0}
+
+
+class TokenBucket:
+    """Tokens left to a client, refilled continuously up to capacity."""
+
+    def __init__(self, capacity, rate):
+        self.lock = threading.Lock()
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = float(capacity)
+        self.updated = time.time()
+        self.spent = 0
+        self.synced_at = None
+
+    def refill(self, now):
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+    def idle(self, now):
+        """Tell whether the bucket would be full again by now."""
+        return now - self.updated >= self.capacity / self.rate
+
+
+def get_bucket(key, capacity, rate):
+    """Return the bucket of this process for key, dropping idle buckets."""
+    now = time.time()
+    with _buckets_lock:
+        if now - _state['pruned_at'] >= settings.THROTTLE_SYNC_INTERVAL:
+            for idle_key in [
+                idle_key for idle_key, bucket in _buckets.items()
+                if bucket.idle(now)
+            ]:
+                del _buckets[idle_key]
+            _state['pruned_at'] = now
+        if key not in _buckets:
+            _buckets[key] = TokenBucket(capacity, rate)
+        return _buckets[key]
+
+
+class ActionThrottle(SimpleRateThrottle):
+    """
+    Token bucket throttle of the actions named in view.throttle_scopes,
+    per user or per IP address of anonymous clients.
+
+    Buckets live in process memory, so a check costs no cache round trip.
+    A bucket is synced with the default cache, which every process shares
+    (see the api.W001 check), on its first use, when it runs out and every
+    THROTTLE_SYNC_INTERVAL seconds: the tokens spent here are taken from
+    the shared bucket and the result replaces the local one.
+    A client spread over several processes can get through at most what
+    each process allows between two syncs on top of the rate.
+    """
+
+    cache_format = 'throttle_%(scope)s_%(ident)s'
+
+    def __init__(self):
+        # The scope and rate are known once the view action is.
+        pass
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, 'throttle_scopes', {}).get(view.action)
+        if self.scope is None:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        self.key = self.get_cache_key(request, view)
+        self.bucket = get_bucket(
+            self.key, self.num_requests, self.num_requests / self.duration
+        )
+        now = time.time()
+        with self.bucket.lock:
+            self.bucket.refill(now)
+            if (
+                self.bucket.synced_at is None
+                or now - self.bucket.synced_at
+                >= settings.THROTTLE_SYNC_INTERVAL
+                or self.bucket.tokens < 1 and self.bucket.spent
+            ):
+                self.sync(now)
+            if self.bucket.tokens < 1:
+                return self.throttle_failure()
+            self.bucket.tokens -= 1
+            self.bucket.spent += 1
+        return self.throttle_success()
+
+    def sync(self, now):
+        """
+        Take the tokens spent since the last sync from the shared bucket.
+        Concurrent syncs of one client may lose some spent tokens, which
+        only makes the limit a little more lenient.
+        """
+        bucket = self.bucket
+        shared = self.cache.get(self.key)
+        observe_cache('throttle', shared is not None)
+        if shared is not None:
+            tokens, updated = shared
+            bucket.tokens = max(0.0, min(
+                bucket.capacity, tokens + (now - updated) * bucket.rate
+            ) - bucket.spent)
+        bucket.spent = 0
+        bucket.synced_at = now
+        self.cache.set(self.key, (bucket.tokens, now), self.duration)
+
+    def throttle_success(self):
+        return True
+
+    def wait(self):
+        """Return the seconds until the bucket holds a token again."""
+        return (1 - self.bucket.tokens) / self.bucket.rate
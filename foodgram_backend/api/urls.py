@@ -6,7 +6,8 @@ from api.views import (
     RecipesViewSet,
     CustomUserViewSet,
     TagViewSet,
-    IngredientViewSet
+    IngredientViewSet,
+    metrics_view
 )
 
 app_name = 'api'
@@ -19,5 +20,6 @@ router_v1.register(r'ingredients', IngredientViewSet, basename='ingredients')
 
 urlpatterns = [
     url(r'^auth/', include('djoser.urls.authtoken')),
+    url(r'^metrics/?$', metrics_view, name='metrics'),
     url(r'', include(router_v1.urls)),
 ]
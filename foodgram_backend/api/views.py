@@ -1,37 +1,56 @@
-from django.http import HttpResponse
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import get_object_or_404
+from django.utils.crypto import constant_time_compare
 
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import (
+    AllowAny,
     IsAuthenticated,
     IsAuthenticatedOrReadOnly
 )
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 from djoser.views import UserViewSet
+from prometheus_client import CONTENT_TYPE_LATEST
 
+from api import cards, metrics
+from api.caching import RECIPE_KEYS, SurrogateKeyMixin, recipe_keys
+from api.cards import RecipeCardSerializer
+from api.etags import not_modified, recipes_etag
+from api.fieldsets import requested_fields
 from api.filters import IngredientSearchFilter, RecipeFilter
-from api.paginators import CustomPagination
+from api.paginators import CustomPagination, KeysetPagination
 from api.permissions import IsAuthorOrReadOnly
+from api.throttles import ActionThrottle
 from api.serializers import (
     IngredientSerializer,
     RecipeCreateSerializer,
     RecipeForSubscriptionSerializer,
+    RecipeIdsSerializer,
     RecipeListSerializer,
+    ShoppingCartServingsSerializer,
+    ShoppingListLineSerializer,
     SubscriptionsSerializer,
     TagSerializer,
     SubscriptionCreateSerializer,
 )
+from recipes import feed as subscription_feed
+from recipes import images, shopping_list, units
+from recipes.background import enqueue
 from recipes.models import (
     Favorite,
     Ingredient,
     Recipe,
-    RecipeIngredient,
     ShoppingCart,
+    SimilarRecipe,
     Tag
 )
 from users.models import Subscription
@@ -39,10 +58,66 @@ from users.models import Subscription
 User = get_user_model()
 
 
-class CustomUserViewSet(UserViewSet):
+def metrics_view(request):
+    """
+    Expose the application metrics in the Prometheus text format.
+    Scrapers must send METRICS_TOKEN as a bearer token or, while it is not
+    set, connect from one of METRICS_ALLOWED_IPS.
+    """
+    token = settings.METRICS_TOKEN
+    if token:
+        allowed = constant_time_compare(
+            request.headers.get('Authorization', ''), f'Bearer {token}'
+        )
+    else:
+        allowed = (
+            request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+        )
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        metrics.render(),
+        content_type=CONTENT_TYPE_LATEST
+    )
+
+
+class CustomUserViewSet(SurrogateKeyMixin, UserViewSet):
     """Viewset for managing users and subscriptions."""
 
     pagination_class = CustomPagination
+    cached_actions = ('retrieve',)
+    throttle_classes = (ActionThrottle,)
+    throttle_scopes = {
+        'create': 'signup',
+        'subscribe': 'subscribe',
+    }
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_authenticated and self.action in ('list', 'retrieve'):
+            queryset = queryset.annotate(
+                is_subscribed=Exists(Subscription.objects.filter(
+                    user=user, author=OuterRef('pk')
+                ))
+            )
+        return queryset
+
+    def retrieve(self, request, *args, **kwargs):
+        self.add_surrogate_keys(f'author-{kwargs[self.lookup_field]}')
+        return super().retrieve(request, *args, **kwargs)
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if (
+                self.action == 'list'
+                and self.request.query_params.get('pagination') == 'keyset'
+            ):
+                self._paginator = KeysetPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
 
     @action(detail=False,
             methods=['get'],
@@ -56,8 +131,14 @@ class CustomUserViewSet(UserViewSet):
             methods=['get'],
             permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
-        subscriptions = request.user.subscriptions.all()
-        authors = [subscription.author for subscription in subscriptions]
+        authors = User.objects.filter(
+            subscribers__user=request.user
+        ).order_by('subscribers__id')
+        fields = requested_fields(request, SubscriptionsSerializer.Meta.fields)
+        if 'recipes_count' in fields:
+            authors = authors.annotate(
+                recipes_count=Count('recipes', distinct=True)
+            )
         page = self.paginate_queryset(authors)
         serializer = SubscriptionsSerializer(
             page,
@@ -103,48 +184,194 @@ class CustomUserViewSet(UserViewSet):
                 )
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(SurrogateKeyMixin, ReadOnlyModelViewSet):
     """Viewset for retrieving tags."""
 
     serializer_class = TagSerializer
     queryset = Tag.objects.all()
     pagination_class = None
+    surrogate_keys = ('tags',)
+    proxy_cache_timeout = settings.PROXY_CACHE_REFERENCE_TIMEOUT
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(SurrogateKeyMixin, ReadOnlyModelViewSet):
     """Viewset for retrieving ingredients."""
 
     serializer_class = IngredientSerializer
     queryset = Ingredient.objects.all()
     pagination_class = None
+    surrogate_keys = ('ingredients',)
+    proxy_cache_timeout = settings.PROXY_CACHE_REFERENCE_TIMEOUT
     filter_backends = (IngredientSearchFilter,)
     search_fields = ('^name',)
+    throttle_classes = (ActionThrottle,)
+    throttle_scopes = {'list': 'ingredient_search'}
 
 
-class RecipesViewSet(ModelViewSet):
+class RecipesViewSet(SurrogateKeyMixin, ModelViewSet):
     """Viewset for managing recipes."""
 
     queryset = Recipe.objects.all()
     pagination_class = CustomPagination
+    surrogate_keys = RECIPE_KEYS
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     permission_classes = (IsAuthorOrReadOnly, IsAuthenticatedOrReadOnly)
+    # Sent with POST for long id lists, but only reading.
+    read_only_actions = ('batch',)
+    throttle_classes = (ActionThrottle,)
+    throttle_scopes = {
+        'create': 'recipe_write',
+        'update': 'recipe_write',
+        'partial_update': 'recipe_write',
+        'destroy': 'recipe_write',
+        'favorite': 'recipe_mark',
+        'shopping_cart': 'recipe_mark',
+        'download_shopping_cart': 'shopping_list_export',
+        'shopping_list': 'shopping_list_export',
+    }
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve', 'feed', 'batch'):
+            return queryset
+
+        fields = requested_fields(
+            self.request, RecipeCardSerializer.Meta.fields
+        )
+        deferred = {
+            'name', 'image', 'image_width', 'image_height',
+            'image_placeholder', 'text', 'cooking_time',
+            'kcal', 'protein', 'fat', 'carbs', 'cost',
+            'unweighed_ingredients', 'tags_mask',
+        } - fields
+        queryset = queryset.defer(*deferred)
+        if fields & set(cards.CARD_FIELDS):
+            queryset = queryset.select_related('card')
+        return queryset
 
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
+        cards.rebuild([serializer.instance.id])
+        enqueue(images.optimize, serializer.instance.id)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        serializer.save()
+        cards.rebuild([serializer.instance.id])
+        if 'image' in serializer.validated_data:
+            enqueue(images.optimize, serializer.instance.id)
 
     def get_serializer_class(self):
         if self.action in ('create', 'update', 'patch', 'partial_update'):
             return RecipeCreateSerializer
+        if self.action in ('list', 'retrieve', 'feed', 'batch'):
+            return RecipeCardSerializer
         return RecipeListSerializer
 
+    def list(self, request, *args, **kwargs):
+        self.add_surrogate_keys('recipes')
+        if 'ids' in request.query_params:
+            ids = request.query_params['ids'].split(',')
+            return self.batch_response({'ids': ids})
+        page = self.paginate_queryset(
+            self.filter_queryset(self.get_queryset())
+        )
+        context = self.get_serializer_context()
+        etag = recipes_etag(page, context, self.paginator.page.paginator.count)
+        if not_modified(request, etag):
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag}
+            )
+        serializer = self.get_serializer(page, many=True, context=context)
+        response = self.get_paginated_response(serializer.data)
+        response['ETag'] = etag
+        return response
+
+    @action(
+        detail=False,
+        methods=['post'],
+        permission_classes=[AllowAny]
+    )
+    def batch(self, request):
+        return self.batch_response(request.data)
+
+    def batch_response(self, data):
+        """
+        Return the recipes with the requested ids in the requested order,
+        and the ids of the recipes that do not exist.
+        """
+        ids_serializer = RecipeIdsSerializer(data=data)
+        ids_serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(ids_serializer.validated_data['ids']))
+        recipes = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in ids if pk in recipes], many=True
+        )
+        return Response({
+            'results': serializer.data,
+            'missing': [pk for pk in ids if pk not in recipes],
+        })
+
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
-        serializer = self.get_serializer(instance)
+        self.add_surrogate_keys(*recipe_keys(instance))
+        context = self.get_serializer_context()
+        etag = recipes_etag([instance], context)
+        if not_modified(request, etag):
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag}
+            )
+        serializer = self.get_serializer(instance, context=context)
+        return Response(serializer.data, headers={'ETag': etag})
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[IsAuthenticated]
+    )
+    def feed(self, request):
+        try:
+            cursor = subscription_feed.decode_cursor(
+                request.query_params.get('cursor')
+            )
+        except ValueError:
+            raise ValidationError({'cursor': 'Invalid cursor.'})
+        limit = min(
+            self.paginator.get_page_size(request),
+            settings.FEED_MAX_PAGE_SIZE
+        )
+        keys = subscription_feed.page(request.user, cursor, limit)
+        recipes = self.get_queryset().in_bulk([key[1] for key in keys])
+        serializer = self.get_serializer(
+            [recipes[key[1]] for key in keys if key[1] in recipes],
+            many=True
+        )
+        next_url = None
+        if len(keys) == limit:
+            next_url = replace_query_param(
+                request.build_absolute_uri(),
+                'cursor',
+                subscription_feed.encode_cursor(keys[-1])
+            )
+        return Response({'next': next_url, 'results': serializer.data})
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk):
+        recipe = self.get_object()
+        neighbours = SimilarRecipe.objects.filter(
+            recipe=recipe
+        ).select_related('similar')
+        serializer = RecipeForSubscriptionSerializer(
+            [neighbour.similar for neighbour in neighbours],
+            many=True,
+            context={'request': request}
+        )
         return Response(serializer.data)
 
     @action(detail=True,
-            methods=['post', 'delete'],
+            methods=['post', 'patch', 'delete'],
             permission_classes=[IsAuthenticated]
             )
     def shopping_cart(self, request, pk):
@@ -163,13 +390,36 @@ class RecipesViewSet(ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             except ShoppingCart.DoesNotExist:
-                ShoppingCart.objects.create(user=request.user, recipe=recipe)
+                servings_serializer = ShoppingCartServingsSerializer(
+                    data=request.data
+                )
+                servings_serializer.is_valid(raise_exception=True)
+                servings_serializer.save(user=request.user, recipe=recipe)
                 serializer = RecipeForSubscriptionSerializer(recipe)
                 return Response(
                     data=serializer.data,
                     status=status.HTTP_201_CREATED
                 )
 
+        elif request.method == 'PATCH':
+            recipe = get_object_or_404(Recipe, pk=pk)
+            shopping_cart_item = get_object_or_404(
+                request.user.shopping_cart_recipes, recipe=recipe
+            )
+            previous_servings = shopping_cart_item.servings
+            serializer = ShoppingCartServingsSerializer(
+                shopping_cart_item, data=request.data
+            )
+            serializer.is_valid(raise_exception=True)
+            with transaction.atomic():
+                serializer.save()
+                shopping_list.apply_recipe(
+                    request.user.id,
+                    recipe.id,
+                    shopping_cart_item.servings - previous_servings
+                )
+            return Response(serializer.data)
+
         elif request.method == 'DELETE':
             recipe = get_object_or_404(Recipe, pk=pk)
             try:
@@ -189,24 +439,19 @@ class RecipesViewSet(ModelViewSet):
 
     @action(
         detail=False,
-        methods=['get']
+        methods=['get'],
+        permission_classes=[IsAuthenticated]
     )
     def download_shopping_cart(self, request):
-        user = request.user
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__is_in_shopping_cart__user=user
-        ).values(
+        lines = units.render(request.user.shopping_list_items.values_list(
             'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(
-            total_amount=Sum('amount')
-        ).order_by('ingredient__name')
+            'ingredient__measurement_unit',
+            'amount'
+        ))
         shopping_cart_content = 'Shopping list:\n'
-        for item in ingredients:
+        for name, amount, measurement_unit in lines:
             shopping_cart_content += (
-                f"\n* {item['ingredient__name']} "
-                f"({item['ingredient__measurement_unit']}) - "
-                f"{item['total_amount']}\n"
+                f"\n* {name} ({measurement_unit}) - {amount}\n"
             )
 
         response = HttpResponse(
@@ -218,6 +463,27 @@ class RecipesViewSet(ModelViewSet):
         )
         return response
 
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='shopping_cart',
+        permission_classes=[IsAuthenticated]
+    )
+    def shopping_list(self, request):
+        lines = units.render(request.user.shopping_list_items.values_list(
+            'ingredient__name',
+            'ingredient__measurement_unit',
+            'amount'
+        ))
+        serializer = ShoppingListLineSerializer(
+            [
+                {'name': name, 'amount': amount, 'measurement_unit': unit}
+                for name, amount, unit in lines
+            ],
+            many=True
+        )
+        return Response(serializer.data)
+
     @action(detail=True,
             methods=['post', 'delete'],
             permission_classes=[IsAuthenticated]
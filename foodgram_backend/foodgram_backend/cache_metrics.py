@@ -0,0 +1,24 @@
+from prometheus_client import Counter
+
+CACHE_REQUESTS = Counter(
+    'foodgram_cache_requests_total',
+    'Shared cache lookups by result.',
+    ('cache', 'result'),
+)
+
+# Kept apart, so memoised values do not inflate the shared hit ratio.
+LOCAL_CACHE_REQUESTS = Counter(
+    'foodgram_local_cache_requests_total',
+    'Lookups of values held in process memory by result.',
+    ('cache', 'result'),
+)
+
+
+def observe_cache(cache, hit):
+    """Record a shared cache lookup, used to compute cache hit ratios."""
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def observe_local_cache(cache, hit):
+    """Record a lookup of a value held in process memory."""
+    LOCAL_CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
@@ -0,0 +1,85 @@
+import time
+
+from django.db.backends.postgresql import base
+from django.utils.asyncio import async_unsafe
+from django.utils.functional import cached_property
+from psycopg2 import extras
+
+from foodgram_backend.db_backends.postgresql.pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend with connection health checks and optional pooling.
+
+    Extra settings of the database entry:
+    POOL_SIZE - connections pooled per worker, 0 disables the pool;
+    POOL_TIMEOUT - seconds to wait for a free pooled connection;
+    HEALTH_CHECK_INTERVAL - seconds after which an idle persistent
+    or pooled connection is pinged before being reused.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checked_at = None
+
+    @cached_property
+    def pool(self):
+        if not self.settings_dict.get('POOL_SIZE'):
+            return None
+        return get_pool(
+            self.alias,
+            self.get_connection_params(),
+            max_size=self.settings_dict['POOL_SIZE'],
+            timeout=self.settings_dict.get('POOL_TIMEOUT', 10),
+            health_check_interval=self.health_check_interval,
+        )
+
+    @property
+    def health_check_interval(self):
+        return self.settings_dict.get('HEALTH_CHECK_INTERVAL', 30)
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        self.checked_at = time.monotonic()
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+
+        connection = pool.checkout()
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        extras.register_default_jsonb(
+            conn_or_curs=connection, loads=lambda x: x
+        )
+        return connection
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            pool.checkin(self.connection)
+
+    def close_if_unusable_or_obsolete(self):
+        """
+        Also ping a persistent connection once per HEALTH_CHECK_INTERVAL,
+        so that connections dropped by the server or a proxy are replaced
+        before a request fails on them.
+        """
+        super().close_if_unusable_or_obsolete()
+        if self.connection is None or self.in_atomic_block:
+            return
+        now = time.monotonic()
+        if now - self.checked_at < self.health_check_interval:
+            return
+        self.checked_at = now
+        if not self.is_usable():
+            self.connection.close()
+            self.close()
@@ -0,0 +1,141 @@
+import threading
+import time
+
+import psycopg2
+from psycopg2 import extensions
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolExhausted(psycopg2.OperationalError):
+    """No connection was released before the checkout timeout."""
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 connections kept by a worker process.
+    Idle connections are pinged before reuse once they have been idle
+    longer than health_check_interval, and broken ones are replaced.
+    """
+
+    def __init__(self, conn_params, max_size, timeout,
+                 health_check_interval):
+        self.conn_params = conn_params
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._idle = []
+        self._size = 0
+        self._condition = threading.Condition()
+        self.stats = {
+            'connections_created': 0,
+            'connections_discarded': 0,
+            'checkouts': 0,
+            'checkout_waits': 0,
+        }
+
+    def checkout(self):
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            while True:
+                if self._idle:
+                    connection, released_at = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    connection = None
+                    break
+                self.stats['checkout_waits'] += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._condition.wait(remaining):
+                    raise PoolExhausted(
+                        f'No database connection available within '
+                        f'{self.timeout} seconds.'
+                    )
+            self.stats['checkouts'] += 1
+
+        if connection is not None:
+            idle_for = time.monotonic() - released_at
+            if idle_for < self.health_check_interval or self._ping(
+                connection
+            ):
+                return connection
+            self._discard(connection, reserved=True)
+        try:
+            connection = psycopg2.connect(**self.conn_params)
+        except Exception:
+            self._release_slot()
+            raise
+        self.stats['connections_created'] += 1
+        return connection
+
+    def checkin(self, connection):
+        if not connection.closed:
+            status = connection.info.transaction_status
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    connection.rollback()
+                except psycopg2.Error:
+                    pass
+        if connection.closed or (
+            connection.info.transaction_status
+            != extensions.TRANSACTION_STATUS_IDLE
+        ):
+            self._discard(connection)
+            return
+        with self._condition:
+            self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    def snapshot(self):
+        with self._condition:
+            return {
+                **self.stats,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'max_size': self.max_size,
+            }
+
+    @staticmethod
+    def _ping(connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            connection.rollback()
+        except psycopg2.Error:
+            return False
+        return not connection.closed
+
+    def _discard(self, connection, reserved=False):
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+        self.stats['connections_discarded'] += 1
+        if not reserved:
+            self._release_slot()
+
+    def _release_slot(self):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+
+def get_pool(alias, conn_params, max_size, timeout, health_check_interval):
+    """Return the pool of a database alias, creating it on first use."""
+    pool = _pools.get(alias)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(alias)
+            if pool is None:
+                pool = _pools[alias] = ConnectionPool(
+                    conn_params, max_size, timeout, health_check_interval
+                )
+    return pool
+
+
+def pool_stats():
+    """Return the statistics of every pool of this process."""
+    return {alias: pool.snapshot() for alias, pool in _pools.items()}
@@ -0,0 +1,88 @@
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger('foodgram.performance')
+
+# App label of the table of DatabaseCache, which must not lag.
+CACHE_APP_LABEL = 'django_cache'
+
+_use_primary = ContextVar('use_primary', default=False)
+
+_replica_state = {}
+
+
+@contextmanager
+def use_primary():
+    """Send every query of the block to the primary database."""
+    token = _use_primary.set(True)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+def replica_is_healthy(alias):
+    """
+    Check a replica at most once per REPLICA_HEALTH_CHECK_INTERVAL.
+    A replica that fails the check is skipped for REPLICA_RETRY_INTERVAL.
+    """
+    now = time.monotonic()
+    checked_at, healthy = _replica_state.get(alias, (None, True))
+    if checked_at is not None:
+        interval = (
+            settings.REPLICA_HEALTH_CHECK_INTERVAL if healthy
+            else settings.REPLICA_RETRY_INTERVAL
+        )
+        if now - checked_at < interval:
+            return healthy
+
+    connection = connections[alias]
+    try:
+        connection.ensure_connection()
+        healthy = connection.is_usable()
+    except DatabaseError:
+        healthy = False
+    if not healthy:
+        logger.warning('Replica %s is unavailable, using primary.', alias)
+        connection.close()
+    _replica_state[alias] = (now, healthy)
+    return healthy
+
+
+class PrimaryReplicaRouter:
+    """
+    Database router sending reads to replicas and writes to the primary.
+    Reads stay on the primary inside transactions, within use_primary()
+    blocks, for the database cache and when no replica passes its health
+    check.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            model._meta.app_label == CACHE_APP_LABEL
+            or _use_primary.get()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        replicas = [
+            alias for alias in settings.DATABASE_REPLICAS
+            if replica_is_healthy(alias)
+        ]
+        if not replicas:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
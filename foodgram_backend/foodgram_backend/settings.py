@@ -31,6 +31,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.QueryTimingMiddleware',
+    'api.middleware.ProfilingMiddleware',
+    'api.middleware.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -60,19 +64,123 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram_backend.wsgi.application'
 
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 0))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'foodgram_backend.db_backends.postgresql',
         'NAME': os.getenv('POSTGRES_DB', 'postgres'),
         'USER': os.getenv('POSTGRES_USER', 'postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': (
+            0 if DB_POOL_SIZE else int(os.getenv('DB_CONN_MAX_AGE', 60))
+        ),
+        'POOL_SIZE': DB_POOL_SIZE,
+        'POOL_TIMEOUT': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+        'HEALTH_CHECK_INTERVAL': int(
+            os.getenv('DB_HEALTH_CHECK_INTERVAL', 30)),
     }
 }
 
+DATABASE_REPLICAS = []
+
+for index, host in enumerate(
+    filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(','))
+):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['foodgram_backend.db_router.PrimaryReplicaRouter']
+
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 15))
+
+REPLICA_HEALTH_CHECK_INTERVAL = int(
+    os.getenv('REPLICA_HEALTH_CHECK_INTERVAL', 5))
+
+REPLICA_RETRY_INTERVAL = int(os.getenv('REPLICA_RETRY_INTERVAL', 30))
+
+# Cache shared by every process, which throttle buckets and replica pins
+# rely on: Redis when REDIS_URL is set, otherwise the database table made
+# by createcachetable.
+REDIS_URL = os.getenv('REDIS_URL', '')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {
+                'SOCKET_CONNECT_TIMEOUT': 1,
+                'SOCKET_TIMEOUT': 1,
+                # Throttles and pins are skipped while Redis is down.
+                'IGNORE_EXCEPTIONS': True,
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }
+    }
+
 AUTH_USER_MODEL = 'users.User'
 
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'foodgram.performance': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'foodgram.jobs': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+QUERY_TIMING_ENABLED = os.getenv(
+    'QUERY_TIMING_ENABLED', 'True').lower() == 'true'
+
+QUERY_TIMING_SAMPLE_RATE = float(os.getenv('QUERY_TIMING_SAMPLE_RATE', 0.01))
+
+SLOW_REQUEST_THRESHOLD_MS = int(os.getenv('SLOW_REQUEST_THRESHOLD_MS', 500))
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Addresses allowed to read the metrics without METRICS_TOKEN. They are
+# those of the direct peer, so the address of a proxy must not be listed.
+METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1').split(',')
+
+# Profiling is off unless a directory for the profiles is set.
+PROFILING_DIR = os.getenv('PROFILING_DIR', '')
+
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0))
+
+# cprofile or sampler.
+PROFILING_MODE = os.getenv('PROFILING_MODE', 'cprofile')
+
+PROFILING_SAMPLER_INTERVAL = 0.005
+
+PROFILING_TOKEN_MAX_AGE = 60 * 60
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -115,6 +223,17 @@ REST_FRAMEWORK = {
     'TEST_REQUEST_DEFAULT_FORMAT': 'json',
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 6,
+    # Proxies in front of the app, whose X-Forwarded-For entries are
+    # trusted when telling anonymous clients apart.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 0)),
+    'DEFAULT_THROTTLE_RATES': {
+        'recipe_write': '30/min',
+        'recipe_mark': '120/min',
+        'shopping_list_export': '10/min',
+        'ingredient_search': '120/min',
+        'signup': '10/hour',
+        'subscribe': '60/min',
+    },
 }
 
 DJOSER = {
@@ -151,8 +270,102 @@ MAX_LENGTH_MEASURING_UNIT = 200
 
 MAX_LENGTH_RECIPE_TEXT = 500
 
+MAX_LENGTH_IMAGE_PLACEHOLDER = 64
+
 MIN_COOK_TIME = 1
 
 MAX_COOK_TIME = 32_000
 
 DEFAULT_RECIPES_LIMIT = 6
+
+MIN_SERVINGS = 1
+
+MAX_SERVINGS = 100
+
+FEED_FANOUT_BATCH_SIZE = 1000
+
+FEED_PULL_FOLLOWERS_THRESHOLD = int(
+    os.getenv('FEED_PULL_FOLLOWERS_THRESHOLD', 10_000))
+
+FEED_BACKFILL_SIZE = 50
+
+FEED_MAX_PAGE_SIZE = 100
+
+RECIPES_BATCH_MAX_SIZE = 100
+
+SIMILAR_RECIPES_COUNT = 10
+
+# MinHash signatures of 16 bands of 2 rows make recipes candidates from
+# a Jaccard similarity of about (1/16) ** (1/2) = 0.25, below the typical
+# score of listed neighbours (0.3 to 0.5). On seeddemo data this finds
+# 82% of the exact top 10. Three rows per band need 48 bands, three times
+# the buckets and hashing, to match that recall with 24% fewer candidates,
+# and 16 bands of 3 rows only find 53%.
+SIMILARITY_PERMUTATIONS = 32
+
+SIMILARITY_BANDS = 16
+
+# A recipe stores its tags as bits of a signed 64-bit integer.
+MAX_TAGS = 63
+
+TAG_MAP_TIMEOUT = 60
+
+INGREDIENT_SEARCH_LIMIT = 10
+
+INGREDIENT_SEARCH_THRESHOLD = 0.3
+
+# Processes apply ingredients changed elsewhere to their search index this
+# often, re-reading the changes of the last INGREDIENT_INDEX_SYNC_LAG
+# seconds in case their transactions committed late.
+INGREDIENT_INDEX_SYNC_INTERVAL = 10
+
+INGREDIENT_INDEX_SYNC_LAG = 60
+
+# Run background jobs in a thread of the web process instead of queueing
+# them for the runworker command.
+JOBS_EAGER = os.getenv('JOBS_EAGER', 'False').lower() == 'true'
+
+JOB_WORKER_CONCURRENCY = int(os.getenv('JOB_WORKER_CONCURRENCY', 4))
+
+JOB_MAX_ATTEMPTS = 5
+
+JOB_RETRY_DELAY = 10
+
+# A running job is leased to its worker for JOB_LEASE seconds, extended
+# every JOB_HEARTBEAT_INTERVAL seconds while the worker is alive. Jobs
+# whose lease expired are queued again.
+JOB_LEASE = 60
+
+JOB_HEARTBEAT_INTERVAL = 15
+
+JOB_RETENTION = 60 * 60 * 24
+
+RECIPE_IMAGE_MAX_SIZE = 1600
+
+# BlurHash components along the longer and the shorter side of an image.
+IMAGE_PLACEHOLDER_COMPONENTS = (4, 3)
+
+# Unused images younger than this are kept by gcmedia, as an upload is
+# stored before the recipe using it is saved.
+MEDIA_GC_MIN_AGE = 60 * 60 * 24
+
+DELETION_CHUNK_SIZE = 1000
+
+THROTTLE_SYNC_INTERVAL = 5
+
+# Shared cache lifetime of anonymous recipe responses, and of tags and
+# ingredients, which change rarely. Entries are purged on changes anyway.
+PROXY_CACHE_TIMEOUT = int(os.getenv('PROXY_CACHE_TIMEOUT', 60))
+
+PROXY_CACHE_REFERENCE_TIMEOUT = int(
+    os.getenv('PROXY_CACHE_REFERENCE_TIMEOUT', 60 * 60)
+)
+
+# Base URLs of the caching proxies to send PURGE requests to, left empty
+# unless they run ngx_cache_purge with infra/nginx-purge.conf.
+PROXY_CACHE_PURGE_URLS = [
+    url.rstrip('/')
+    for url in os.getenv('PROXY_CACHE_PURGE_URLS', '').split(',') if url
+]
+
+PROXY_CACHE_PURGE_TIMEOUT = 5
@@ -0,0 +1,32 @@
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+
+def on_starting(server):
+    """Start every deployment with an empty metrics directory."""
+    path = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """Drop the live gauges of a worker that has exited."""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    """Build the ingredient search index before serving requests."""
+    from django.db import DatabaseError, connections
+
+    from recipes import ingredient_search
+
+    try:
+        ingredient_search.build()
+    except DatabaseError:
+        worker.log.exception('Ingredient index not built, left to searches')
+    finally:
+        connections.close_all()
@@ -1,12 +1,18 @@
 from django.contrib import admin
 
+from recipes import deletion
+from recipes.background import enqueue
+from recipes.signals import recipes_changed
 from recipes.models import (
     Recipe,
     Ingredient,
+    Job,
     Tag,
     Favorite,
     ShoppingCart,
-    RecipeIngredient
+    ShoppingListItem,
+    RecipeIngredient,
+    StoredImage
 )
 
 
@@ -38,6 +44,21 @@ class RecipeAdmin(admin.ModelAdmin):
         'name',
         'tags',
     )
+    actions = ('delete_in_background',)
+
+    @admin.action(description='Delete selected recipes in the background')
+    def delete_in_background(self, request, queryset):
+        recipe_ids = list(queryset.values_list('id', flat=True))
+        enqueue(deletion.delete_recipes, recipe_ids)
+        self.message_user(
+            request, f'Deletion of {len(recipe_ids)} recipes is queued.'
+        )
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        recipes_changed.send(
+            sender=Recipe, recipe_ids=[form.instance.id]
+        )
 
     def favorites_count(self, obj):
         return obj.favorites.count()
@@ -130,3 +151,63 @@ class RecipeIngredientAdmin(admin.ModelAdmin):
         'recipe',
         'amount'
     )
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    """Admin setup for the aggregated shopping list model."""
+
+    list_display = (
+        'user',
+        'ingredient',
+        'amount',
+    )
+    search_fields = (
+        'user__username',
+    )
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Admin setup for the background job model."""
+
+    list_display = (
+        'function',
+        'status',
+        'attempts',
+        'run_at',
+        'locked_until',
+        'finished_at',
+    )
+    list_filter = (
+        'status',
+    )
+    search_fields = (
+        'function',
+        'key',
+    )
+
+
+@admin.register(StoredImage)
+class StoredImageAdmin(admin.ModelAdmin):
+    """Admin setup for the content-addressed image model."""
+
+    list_display = (
+        'name',
+        'width',
+        'height',
+        'references',
+        'created_at',
+    )
+    search_fields = (
+        'sha256',
+        'name',
+    )
+    readonly_fields = (
+        'sha256',
+        'name',
+        'width',
+        'height',
+        'placeholder',
+        'references',
+    )
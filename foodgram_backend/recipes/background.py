@@ -0,0 +1,167 @@
+import logging
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from foodgram_backend.db_router import use_primary
+from recipes.models import Job
+
+logger = logging.getLogger('foodgram.jobs')
+
+_eager_executor = ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix='recipes'
+)
+
+
+def enqueue(function, *args, key=None, delay=0):
+    """
+    Queue a call of a module-level function for the runworker command.
+    The job row is written in the current transaction, so the job only
+    exists if the transaction commits. A job is dropped when a queued job
+    with the same key is already waiting. With JOBS_EAGER the call runs in
+    a thread of this process after the commit instead.
+    """
+    if settings.JOBS_EAGER:
+        transaction.on_commit(
+            lambda: _eager_executor.submit(_call, function, args)
+        )
+        return
+    Job.objects.bulk_create(
+        [Job(
+            function=f'{function.__module__}.{function.__qualname__}',
+            args=list(args),
+            key=key,
+            run_at=timezone.now() + timedelta(seconds=delay)
+        )],
+        ignore_conflicts=True
+    )
+
+
+def _call(function, args):
+    try:
+        with use_primary():
+            function(*args)
+    except Exception:
+        logger.exception('Background call of %s failed', function)
+    finally:
+        close_old_connections()
+
+
+def _lease_end():
+    return timezone.now() + timedelta(seconds=settings.JOB_LEASE)
+
+
+def claim(limit):
+    """
+    Mark up to limit due jobs as running, leased to the caller for
+    JOB_LEASE seconds, and return their ids.
+    """
+    now = timezone.now()
+    with use_primary(), transaction.atomic():
+        ids = list(Job.objects.select_for_update(skip_locked=True).filter(
+            status=Job.QUEUED, run_at__lte=now
+        ).values_list('id', flat=True)[:limit])
+        Job.objects.filter(id__in=ids).update(
+            status=Job.RUNNING,
+            started_at=now,
+            locked_until=_lease_end(),
+            attempts=F('attempts') + 1
+        )
+    return ids
+
+
+def heartbeat(job_ids):
+    """Extend the leases of the running jobs of a live worker."""
+    with use_primary():
+        Job.objects.filter(id__in=job_ids, status=Job.RUNNING).update(
+            locked_until=_lease_end()
+        )
+
+
+def _requeue(job, **fields):
+    """Queue a job again, or fail it if a job with its key is queued."""
+    try:
+        with transaction.atomic():
+            Job.objects.filter(pk=job.pk).update(status=Job.QUEUED, **fields)
+    except IntegrityError:
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.FAILED,
+            finished_at=timezone.now(),
+            error=fields.get('error', 'Superseded by a queued job.')
+        )
+
+
+def run(job_id):
+    """
+    Run a claimed job. A failing job is retried with an exponential delay
+    until it has made JOB_MAX_ATTEMPTS attempts.
+    """
+    try:
+        with use_primary():
+            job = Job.objects.get(pk=job_id)
+            try:
+                import_string(job.function)(*job.args)
+            except Exception:
+                error = traceback.format_exc()
+                logger.warning(
+                    'Job %s %s failed on attempt %s:\n%s',
+                    job.id, job.function, job.attempts, error
+                )
+                if job.attempts < settings.JOB_MAX_ATTEMPTS:
+                    delay = settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+                    _requeue(
+                        job,
+                        error=error,
+                        run_at=timezone.now() + timedelta(seconds=delay)
+                    )
+                else:
+                    Job.objects.filter(pk=job.pk).update(
+                        status=Job.FAILED,
+                        finished_at=timezone.now(),
+                        error=error
+                    )
+            else:
+                Job.objects.filter(pk=job.pk).update(
+                    status=Job.DONE, finished_at=timezone.now()
+                )
+    finally:
+        close_old_connections()
+
+
+def requeue_stale():
+    """
+    Queue again the jobs left running by a worker that died, whose lease
+    was not extended in time. Long jobs of live workers keep running.
+    A job that took its worker down JOB_MAX_ATTEMPTS times fails.
+    """
+    with use_primary():
+        stale = Job.objects.filter(
+            status=Job.RUNNING, locked_until__lt=timezone.now()
+        )
+        for job in stale:
+            if job.attempts < settings.JOB_MAX_ATTEMPTS:
+                _requeue(job, run_at=timezone.now(), locked_until=None)
+            else:
+                Job.objects.filter(pk=job.pk).update(
+                    status=Job.FAILED,
+                    finished_at=timezone.now(),
+                    locked_until=None,
+                    error='The worker running the job stopped.'
+                )
+
+
+def purge():
+    """Delete finished jobs older than JOB_RETENTION."""
+    with use_primary():
+        Job.objects.filter(
+            status__in=(Job.DONE, Job.FAILED),
+            finished_at__lt=timezone.now() - timedelta(
+                seconds=settings.JOB_RETENTION
+            )
+        ).delete()
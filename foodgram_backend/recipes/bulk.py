@@ -0,0 +1,60 @@
+from django.db import connection, transaction
+from django.db.models import Max
+
+from recipes import images, nutrition
+from recipes.models import Recipe, RecipeIngredient
+
+
+def _insert(recipes):
+    if not connection.features.can_return_rows_from_bulk_insert:
+        # Backends such as SQLite do not return the ids of bulk inserted
+        # rows, so they are allocated in the transaction.
+        next_id = (Recipe.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+        for offset, recipe in enumerate(recipes):
+            recipe.id = next_id + offset
+    Recipe.objects.bulk_create(recipes)
+
+
+@transaction.atomic
+def create_recipes(recipes, ingredients, tags):
+    """
+    Insert unsaved recipes with their ingredient lines and tags, without
+    sending save signals. ingredients holds the (ingredient_id, amount)
+    pairs and tags the Tag objects of each recipe. A pub_date set on a
+    recipe is kept. Nutrition totals are stored, cards are left to the
+    caller. References of stored images are counted.
+    """
+    pub_dates = [recipe.pub_date for recipe in recipes]
+    for recipe, recipe_tags in zip(recipes, tags):
+        recipe.tags_mask = 0
+        for tag in recipe_tags:
+            recipe.tags_mask |= 1 << tag.bit
+    _insert(recipes)
+    RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(
+            recipe_id=recipe.id, ingredient_id=ingredient_id, amount=amount
+        )
+        for recipe, lines in zip(recipes, ingredients)
+        for ingredient_id, amount in lines
+    ])
+    Recipe.tags.through.objects.bulk_create([
+        Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+        for recipe, recipe_tags in zip(recipes, tags)
+        for tag in recipe_tags
+    ])
+
+    # bulk_create sets pub_date to now, as for any recipe added, so it is
+    # restored together with the nutrition totals.
+    totals = nutrition.calculate([recipe.id for recipe in recipes])
+    for recipe, pub_date in zip(recipes, pub_dates):
+        recipe.pub_date = pub_date or recipe.pub_date
+        for field, value in totals[recipe.id].items():
+            setattr(recipe, field, value)
+    Recipe.objects.bulk_update(
+        recipes, [
+            'pub_date',
+            *(field for field, _ in nutrition.NUTRIENTS),
+            'unweighed_ingredients',
+        ]
+    )
+    images.recount({recipe.image.name for recipe in recipes})
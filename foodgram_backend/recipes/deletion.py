@@ -0,0 +1,105 @@
+import logging
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import models, transaction
+from django.db.models.signals import post_delete, pre_delete
+
+from recipes import similarity
+from recipes.background import enqueue
+from recipes.models import Recipe, SimilarRecipe
+from recipes.signals import recipes_deleted
+
+logger = logging.getLogger('foodgram.jobs')
+
+
+def _cascades(model):
+    """
+    Return the relations deleting their rows with a row of model.
+    Rows with delete signals go first, as their receivers may read
+    sibling rows, such as the ingredient lines of a recipe in a cart.
+    """
+    relations = [
+        relation for relation in model._meta.get_fields(include_hidden=True)
+        if (relation.one_to_many or relation.one_to_one)
+        and relation.auto_created and not relation.concrete
+        and relation.on_delete is models.CASCADE
+    ]
+    return sorted(relations, key=lambda relation: not (
+        pre_delete.has_listeners(relation.related_model)
+        or post_delete.has_listeners(relation.related_model)
+    ))
+
+
+def _log_progress(counts):
+    logger.info('Deleted %s', dict(counts))
+
+
+def delete_in_chunks(queryset, chunk_size, counts, progress):
+    """
+    Delete the rows of queryset chunk by chunk, after the rows cascading
+    from each chunk. Every chunk is deleted in its own short transaction,
+    so no lock is held for long and memory stays flat. The counts of
+    deleted rows by model are passed to progress after every chunk.
+    Neighbour lists losing deleted recipes are refilled afterwards, as
+    their rows are gone by the time the recipes send pre_delete.
+    """
+    model = queryset.model
+    relations = _cascades(model)
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return
+        owner_ids = []
+        if model is Recipe:
+            owner_ids = list(
+                SimilarRecipe.objects.filter(similar_id__in=ids).exclude(
+                    recipe_id__in=ids
+                ).values_list('recipe_id', flat=True).distinct().order_by()
+            )
+        for relation in relations:
+            delete_in_chunks(
+                relation.related_model._base_manager.filter(
+                    **{f'{relation.field.name}__in': ids}
+                ).order_by(),
+                chunk_size,
+                counts,
+                progress
+            )
+        with transaction.atomic():
+            _, by_model = model._base_manager.filter(
+                pk__in=ids
+            ).delete()
+        if owner_ids:
+            enqueue(similarity.refill, owner_ids)
+        counts.update(by_model)
+        progress(counts)
+
+
+def _delete(queryset, chunk_size, progress):
+    counts = Counter()
+    delete_in_chunks(
+        queryset, chunk_size or settings.DELETION_CHUNK_SIZE, counts, progress
+    )
+    if counts[Recipe._meta.label]:
+        recipes_deleted.send(sender=Recipe)
+    return counts
+
+
+def delete_users(user_ids, chunk_size=None, progress=_log_progress):
+    """Delete users with their recipes and every row depending on them."""
+    return _delete(
+        get_user_model().objects.filter(pk__in=user_ids).order_by('pk'),
+        chunk_size,
+        progress
+    )
+
+
+def delete_recipes(recipe_ids, chunk_size=None, progress=_log_progress):
+    """Delete recipes and every row depending on them."""
+    return _delete(
+        Recipe.objects.filter(pk__in=recipe_ids).order_by('pk'),
+        chunk_size,
+        progress
+    )
@@ -0,0 +1,290 @@
+import binascii
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from heapq import merge
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from foodgram_backend.cache_metrics import observe_cache
+from foodgram_backend.db_router import use_primary
+from recipes.background import enqueue
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscription, User
+
+PULL_AUTHORS_CACHE_KEY = 'feed:pull-authors'
+
+
+def pull_authors():
+    """
+    Return ids of the authors on the pull path, set by switch_mode once
+    they have more subscribers than FEED_PULL_FOLLOWERS_THRESHOLD. Their
+    recipes are not copied to the inboxes and are read from the recipe
+    table at request time instead.
+    """
+    authors = cache.get(PULL_AUTHORS_CACHE_KEY)
+    observe_cache('feed_pull_authors', authors is not None)
+    if authors is None:
+        with use_primary():
+            authors = set(
+                User.objects.filter(feed_pull=True).values_list(
+                    'id', flat=True
+                )
+            )
+        cache.set(PULL_AUTHORS_CACHE_KEY, authors, 300)
+    return authors
+
+
+def _needs_switch(count, pull):
+    return (count > settings.FEED_PULL_FOLLOWERS_THRESHOLD) != pull
+
+
+def count_follower(author_id, delta):
+    """
+    Add delta to the follower count of an author, queueing switch_mode
+    when the count crosses FEED_PULL_FOLLOWERS_THRESHOLD.
+    """
+    authors = User.objects.filter(pk=author_id)
+    if delta < 0:
+        authors = authors.filter(follower_count__gte=-delta)
+    authors.update(follower_count=F('follower_count') + delta)
+    with use_primary():
+        author = User.objects.filter(pk=author_id).values_list(
+            'follower_count', 'feed_pull'
+        ).first()
+    if author is not None and _needs_switch(*author):
+        enqueue(switch_mode, author_id, key=f'feed-mode:{author_id}')
+
+
+def recount_followers(author_ids):
+    """
+    Set the follower counts of authors whose subscriptions were added in
+    bulk, switching the authors whose count crossed the threshold.
+    """
+    User.objects.filter(pk__in=author_ids).update(follower_count=Coalesce(
+        Subquery(
+            Subscription.objects.filter(author=OuterRef('pk')).values(
+                'author'
+            ).annotate(count=Count('id')).values('count')
+        ),
+        0
+    ))
+    with use_primary():
+        authors = list(User.objects.filter(pk__in=author_ids).values_list(
+            'id', 'follower_count', 'feed_pull'
+        ))
+    for author_id, count, pull in authors:
+        if _needs_switch(count, pull):
+            switch_mode(author_id)
+
+
+def switch_mode(author_id):
+    """
+    Move an author to the feed path matching their follower count.
+    Inbox entries of the author are deleted once the author is pulled,
+    and their latest recipes are copied to every follower's inbox before
+    the author is pushed again. Feed pages merge and deduplicate both
+    sources, so readers see no gap while this runs.
+    """
+    with use_primary():
+        author = User.objects.filter(pk=author_id).values_list(
+            'follower_count', 'feed_pull'
+        ).first()
+    if author is None or not _needs_switch(*author):
+        return
+    if not author[1]:
+        User.objects.filter(pk=author_id).update(feed_pull=True)
+        cache.delete(PULL_AUTHORS_CACHE_KEY)
+        entries = FeedEntry.objects.filter(author_id=author_id)
+        while True:
+            ids = list(entries.values_list('pk', flat=True)[
+                :settings.FEED_FANOUT_BATCH_SIZE
+            ])
+            if not ids:
+                break
+            FeedEntry.objects.filter(pk__in=ids).delete()
+        return
+    started = timezone.now()
+    _copy_to_followers(author_id)
+    User.objects.filter(pk=author_id).update(feed_pull=False)
+    cache.delete(PULL_AUTHORS_CACHE_KEY)
+    # Recipes published during the copy were not fanned out.
+    for recipe_id in Recipe.objects.filter(
+        author_id=author_id, pub_date__gte=started
+    ).values_list('id', flat=True):
+        fan_out(recipe_id)
+
+
+def _copy_to_followers(author_id):
+    """Copy the latest recipes of an author to every follower's inbox."""
+    recipes = list(
+        Recipe.objects.filter(author_id=author_id).order_by(
+            '-pub_date', '-id'
+        ).values_list('id', 'pub_date')[:settings.FEED_BACKFILL_SIZE]
+    )
+    if not recipes:
+        return
+    followers = Subscription.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True).order_by('id').iterator(
+        chunk_size=settings.FEED_FANOUT_BATCH_SIZE
+    )
+    while True:
+        batch = list(islice(followers, settings.FEED_FANOUT_BATCH_SIZE))
+        if not batch:
+            break
+        FeedEntry.objects.bulk_create(
+            [
+                FeedEntry(
+                    user_id=user_id,
+                    recipe_id=recipe_id,
+                    author_id=author_id,
+                    pub_date=pub_date
+                )
+                for user_id in batch
+                for recipe_id, pub_date in recipes
+            ],
+            batch_size=settings.FEED_FANOUT_BATCH_SIZE,
+            ignore_conflicts=True
+        )
+
+
+def fan_out(recipe_id):
+    """Copy a new recipe to the inboxes of its author's subscribers."""
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'id', 'author_id', 'pub_date'
+    ).first()
+    if recipe is None or recipe.author_id in pull_authors():
+        return
+    subscribers = Subscription.objects.filter(
+        author_id=recipe.author_id
+    ).values_list('user_id', flat=True).order_by('id').iterator(
+        chunk_size=settings.FEED_FANOUT_BATCH_SIZE
+    )
+    while True:
+        batch = list(islice(subscribers, settings.FEED_FANOUT_BATCH_SIZE))
+        if not batch:
+            break
+        FeedEntry.objects.bulk_create(
+            [
+                FeedEntry(
+                    user_id=user_id,
+                    recipe_id=recipe.id,
+                    author_id=recipe.author_id,
+                    pub_date=recipe.pub_date
+                )
+                for user_id in batch
+            ],
+            ignore_conflicts=True
+        )
+
+
+def backfill(user_id, author_id):
+    """Copy the latest recipes of a newly followed author to an inbox."""
+    if author_id in pull_authors():
+        return
+    recipes = Recipe.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('id', 'pub_date')[:settings.FEED_BACKFILL_SIZE]
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                pub_date=pub_date
+            )
+            for recipe_id, pub_date in recipes
+        ],
+        ignore_conflicts=True
+    )
+
+
+def forget(user_id, author_id):
+    """Remove the recipes of an unfollowed author from an inbox."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def _before(cursor, date_field, id_field):
+    if cursor is None:
+        return Q()
+    pub_date, recipe_id = cursor
+    return Q(**{f'{date_field}__lt': pub_date}) | Q(
+        **{date_field: pub_date, f'{id_field}__lt': recipe_id}
+    )
+
+
+def page(user, cursor, limit):
+    """
+    Return up to limit (pub_date, recipe_id) keys of the feed of a user,
+    newest first and older than cursor. Inbox entries are merged with
+    the recipes of followed authors that are served by the pull path.
+    A recipe found in both counts once, so sources are read again past
+    the last key known complete until limit keys are found or the
+    sources run out.
+    """
+    def pushed(before):
+        return list(FeedEntry.objects.filter(
+            _before(before, 'pub_date', 'recipe_id'), user=user
+        ).order_by('-pub_date', '-recipe_id').values_list(
+            'pub_date', 'recipe_id'
+        )[:limit])
+
+    fetches = [pushed]
+    pulled_authors = pull_authors()
+    if pulled_authors:
+        followed = list(user.subscriptions.filter(
+            author_id__in=pulled_authors
+        ).values_list('author_id', flat=True))
+        if followed:
+            def pulled(before):
+                return list(Recipe.objects.filter(
+                    _before(before, 'pub_date', 'id'), author_id__in=followed
+                ).order_by('-pub_date', '-id').values_list(
+                    'pub_date', 'id'
+                )[:limit])
+
+            fetches.append(pulled)
+
+    keys = []
+    seen = set()
+    while True:
+        sources = [fetch(cursor) for fetch in fetches]
+        # Keys older than the last one of a full source may miss rows.
+        complete_to = max(
+            (source[-1] for source in sources if len(source) == limit),
+            default=None
+        )
+        for key in merge(*sources, reverse=True):
+            if complete_to is not None and key < complete_to:
+                break
+            if key[1] not in seen:
+                seen.add(key[1])
+                keys.append(key)
+                if len(keys) == limit:
+                    return keys
+        if complete_to is None:
+            return keys
+        cursor = complete_to
+
+
+def encode_cursor(key):
+    pub_date, recipe_id = key
+    raw = f'{pub_date.isoformat()}|{recipe_id}'.encode('utf-8')
+    return urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(value):
+    """Return the key encoded in a cursor, raising ValueError if invalid."""
+    if not value:
+        return None
+    try:
+        raw = urlsafe_b64decode(value.encode('ascii')).decode('utf-8')
+        pub_date, recipe_id = raw.split('|')
+        return datetime.fromisoformat(pub_date), int(recipe_id)
+    except (TypeError, UnicodeError, binascii.Error) as error:
+        raise ValueError('Invalid cursor.') from error
@@ -0,0 +1,261 @@
+import hashlib
+import math
+from collections import namedtuple
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError
+from django.db.models import Count, F
+from django.utils import timezone
+from PIL import Image
+
+from foodgram_backend.db_router import use_primary
+from recipes.models import Recipe, StoredImage
+
+IMAGE_DIR = 'recipes_images'
+
+_BASE83 = (
+    '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    'abcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+)
+
+# Side of the thumbnail the placeholder is computed from.
+_PLACEHOLDER_SAMPLE = 32
+
+
+def digest(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def content_name(sha256, extension):
+    """Return the storage name of a file, fanned out by its hash."""
+    return f'{IMAGE_DIR}/{sha256[:2]}/{sha256[2:4]}/{sha256}.{extension}'
+
+
+def _encode83(value, length):
+    return ''.join(
+        _BASE83[value // 83 ** (length - position) % 83]
+        for position in range(1, length + 1)
+    )
+
+
+def _linear(value):
+    value /= 255
+    if value <= 0.04045:
+        return value / 12.92
+    return ((value + 0.055) / 1.055) ** 2.4
+
+
+def _srgb(value):
+    value = max(0.0, min(1.0, value))
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value, exponent):
+    return math.copysign(abs(value) ** exponent, value)
+
+
+def placeholder(image):
+    """
+    Return the BlurHash of a PIL image, a short string the frontend can
+    render as a blurred preview while the image loads.
+    """
+    long_side, short_side = settings.IMAGE_PLACEHOLDER_COMPONENTS
+    if image.width >= image.height:
+        x_components, y_components = long_side, short_side
+    else:
+        x_components, y_components = short_side, long_side
+    sample = image.convert('RGB')
+    sample.thumbnail((_PLACEHOLDER_SAMPLE, _PLACEHOLDER_SAMPLE))
+    width, height = sample.size
+    pixels = [
+        tuple(_linear(channel) for channel in pixel)
+        for pixel in sample.getdata()
+    ]
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            x_basis = [math.cos(math.pi * i * x / width) for x in range(width)]
+            y_basis = [
+                math.cos(math.pi * j * y / height) for y in range(height)
+            ]
+            red = green = blue = 0.0
+            for y in range(height):
+                for x in range(width):
+                    basis = x_basis[x] * y_basis[y]
+                    pixel = pixels[y * width + x]
+                    red += basis * pixel[0]
+                    green += basis * pixel[1]
+                    blue += basis * pixel[2]
+            scale = (1 if i == j == 0 else 2) / (width * height)
+            factors.append((red * scale, green * scale, blue * scale))
+
+    dc, *ac = factors
+    result = _encode83(x_components - 1 + (y_components - 1) * 9, 1)
+    if ac:
+        quantised_max = max(0, min(82, int(
+            max(abs(value) for factor in ac for value in factor) * 166 - 0.5
+        )))
+        maximum = (quantised_max + 1) / 166
+        result += _encode83(quantised_max, 1)
+    else:
+        maximum = 1
+        result += _encode83(0, 1)
+    result += _encode83(
+        (_srgb(dc[0]) << 16) + (_srgb(dc[1]) << 8) + _srgb(dc[2]), 4
+    )
+    for factor in ac:
+        red, green, blue = (
+            max(0, min(18, int(_sign_pow(value / maximum, 0.5) * 9 + 9.5)))
+            for value in factor
+        )
+        result += _encode83(red * 19 * 19 + green * 19 + blue, 2)
+    return result
+
+
+def find(sha256):
+    """
+    Return the stored image with a hash, marked as just uploaded so that
+    gcmedia keeps it. The update waits for gcmedia deleting the row.
+    """
+    with use_primary():
+        if not StoredImage.objects.filter(sha256=sha256).update(
+            created_at=timezone.now()
+        ):
+            return None
+        return StoredImage.objects.filter(sha256=sha256).first()
+
+
+def store(content, extension, sha256=None):
+    """
+    Store image bytes under their hash and return their StoredImage,
+    the existing one when the same bytes were stored before.
+    """
+    sha256 = sha256 or digest(content)
+    stored = find(sha256)
+    if stored is not None:
+        return stored
+    image = Image.open(BytesIO(content))
+    width, height = image.size
+    image.draft('RGB', (_PLACEHOLDER_SAMPLE * 2, _PLACEHOLDER_SAMPLE * 2))
+    name = content_name(sha256, extension)
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(content))
+    try:
+        return StoredImage.objects.create(
+            sha256=sha256,
+            name=name,
+            width=width,
+            height=height,
+            placeholder=placeholder(image),
+        )
+    except IntegrityError:
+        # Stored at the same time by another request.
+        return find(sha256)
+
+
+# Validated image bytes not stored yet.
+Upload = namedtuple('Upload', ('content', 'extension', 'sha256'))
+
+
+def store_upload(image):
+    """
+    Return the StoredImage of a validated image, storing an Upload. Call
+    it when saving the recipe: a file stored in a transaction rolled back
+    afterwards has no row and is left to gcmedia.
+    """
+    if isinstance(image, Upload):
+        return store(*image)
+    return image
+
+
+def recipe_fields(stored):
+    """Return the Recipe fields pointing to a stored image."""
+    return {
+        'image': stored.name,
+        'image_width': stored.width,
+        'image_height': stored.height,
+        'image_placeholder': stored.placeholder,
+    }
+
+
+def retain(name):
+    StoredImage.objects.filter(name=name).update(
+        references=F('references') + 1
+    )
+
+
+def release(name):
+    StoredImage.objects.filter(name=name, references__gt=0).update(
+        references=F('references') - 1
+    )
+
+
+def recount(names):
+    """Set the reference counts of the stored images from the recipes."""
+    counts = dict(
+        Recipe.objects.filter(image__in=names).values_list('image').annotate(
+            count=Count('id')
+        ).order_by()
+    )
+    stored = list(StoredImage.objects.filter(name__in=names))
+    for image in stored:
+        image.references = counts.get(image.name, 0)
+    StoredImage.objects.bulk_update(stored, ['references'])
+    return stored
+
+
+def adopt(name):
+    """
+    Move an image stored under an upload name to content-addressed
+    storage and point the recipes using it to the stored image. The old
+    file is left to the gcmedia command.
+    """
+    with default_storage.open(name, 'rb') as file:
+        content = file.read()
+    extension = Image.open(BytesIO(content)).format.lower()
+    stored = store(content, 'jpg' if extension == 'jpeg' else extension)
+    Recipe.objects.filter(image=name).update(
+        updated_at=timezone.now(), **recipe_fields(stored)
+    )
+    recount([stored.name])
+    return stored
+
+
+def optimize(recipe_id):
+    """
+    Downscale the image of a recipe to RECIPE_IMAGE_MAX_SIZE pixels on
+    its longest side, keeping its name and format. The file keeps the
+    name given by the hash of the uploaded bytes, so uploading them again
+    still finds it.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).only('image').first()
+    if recipe is None or not recipe.image:
+        return
+    stored = StoredImage.objects.filter(name=recipe.image.name).first()
+    if stored is None:
+        stored = adopt(recipe.image.name)
+    if max(stored.width, stored.height) <= settings.RECIPE_IMAGE_MAX_SIZE:
+        return
+    with default_storage.open(stored.name, 'rb') as file:
+        image = Image.open(file)
+        image.load()
+    image_format = image.format
+    image.thumbnail(
+        (settings.RECIPE_IMAGE_MAX_SIZE, settings.RECIPE_IMAGE_MAX_SIZE)
+    )
+    buffer = BytesIO()
+    image.save(buffer, format=image_format, optimize=True)
+    with default_storage.open(stored.name, 'wb') as file:
+        file.write(buffer.getvalue())
+    stored.width, stored.height = image.size
+    stored.save(update_fields=('width', 'height'))
+    Recipe.objects.filter(image=stored.name).update(
+        image_width=stored.width,
+        image_height=stored.height,
+        updated_at=timezone.now()
+    )
@@ -0,0 +1,210 @@
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from foodgram_backend.cache_metrics import observe_local_cache
+from foodgram_backend.db_router import use_primary
+from recipes.models import Ingredient
+from recipes.units import normalize_text
+
+
+def word_trigrams(text):
+    """Return the trigram set of each word of a text, as pg_trgm pads them."""
+    return [
+        {f'  {word} '[index:index + 3] for index in range(len(word) + 1)}
+        for word in normalize_text(text).split()
+    ]
+
+
+def trigrams(text):
+    return set().union(*word_trigrams(text))
+
+
+def similarity(first, second):
+    common = len(first & second)
+    return common / (len(first) + len(second) - common)
+
+
+class TrigramIndex:
+    """In-memory trigram postings of the ingredient names."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.names = {}
+        self.grams = {}
+        self.words = {}
+        self.postings = defaultdict(set)
+
+    def add(self, ingredient_id, name):
+        with self.lock:
+            self._remove(ingredient_id)
+            self.names[ingredient_id] = normalize_text(name)
+            self.words[ingredient_id] = word_trigrams(name)
+            self.grams[ingredient_id] = set().union(
+                *self.words[ingredient_id]
+            )
+            for gram in self.grams[ingredient_id]:
+                self.postings[gram].add(ingredient_id)
+
+    def remove(self, ingredient_id):
+        with self.lock:
+            self._remove(ingredient_id)
+
+    def _remove(self, ingredient_id):
+        for gram in self.grams.pop(ingredient_id, ()):
+            self.postings[gram].discard(ingredient_id)
+            if not self.postings[gram]:
+                del self.postings[gram]
+        self.names.pop(ingredient_id, None)
+        self.words.pop(ingredient_id, None)
+
+    def search(self, query, limit):
+        """
+        Return up to limit ingredient ids matching query, best first.
+        Names starting with the query come first, then names ranked by
+        the trigram similarity of the query to the whole name or to its
+        closest word, kept when above INGREDIENT_SEARCH_THRESHOLD.
+        """
+        text = normalize_text(query)
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+        threshold = settings.INGREDIENT_SEARCH_THRESHOLD
+        # No similarity can exceed the share of query trigrams found.
+        min_common = threshold * len(query_grams)
+        ranked = []
+        with self.lock:
+            shared = Counter()
+            for gram in query_grams:
+                shared.update(self.postings.get(gram, ()))
+            for ingredient_id, common in shared.items():
+                name = self.names[ingredient_id]
+                prefix = name.startswith(text)
+                if common < min_common and not prefix:
+                    continue
+                score = max(
+                    similarity(query_grams, grams)
+                    for grams in (
+                        self.grams[ingredient_id], *self.words[ingredient_id]
+                    )
+                )
+                if prefix or score >= threshold:
+                    ranked.append(
+                        (not prefix, -score, len(name), ingredient_id)
+                    )
+        ranked.sort()
+        return [item[-1] for item in ranked[:limit]]
+
+
+# Counter of the ingredients deleted by any process, in the shared cache.
+DELETIONS_CACHE_KEY = 'ingredient-index:deletions'
+
+_state = {
+    'index': None, 'synced_at': None, 'checked_at': 0.0, 'deletions': None
+}
+_build_lock = threading.Lock()
+_sync_lock = threading.Lock()
+
+
+def build():
+    """
+    Build the index from the database, once per process. gunicorn workers
+    build it before serving requests, other processes on first use.
+    """
+    with _build_lock:
+        if _state['index'] is None:
+            index = TrigramIndex()
+            deletions = _deletions()
+            with use_primary():
+                synced_at = timezone.now()
+                names = Ingredient.objects.values_list('id', 'name')
+                for ingredient_id, name in names.iterator():
+                    index.add(ingredient_id, name)
+            _state.update(
+                index=index,
+                synced_at=synced_at,
+                checked_at=time.monotonic(),
+                deletions=deletions
+            )
+    return _state['index']
+
+
+def _deletions():
+    cache.add(DELETIONS_CACHE_KEY, 0, None)
+    return cache.get(DELETIONS_CACHE_KEY)
+
+
+def sync():
+    """
+    Apply the ingredients saved or deleted by other processes since the
+    last sync. Saved ones are found by updated_at, going back
+    INGREDIENT_INDEX_SYNC_LAG seconds for transactions committed late.
+    Deleted ones are looked for when the deletion counter moved, or when
+    the index holds more ingredients than the table.
+    """
+    index = _state['index']
+    deletions = _deletions()
+    with use_primary():
+        synced_at = timezone.now()
+        for ingredient_id, name in Ingredient.objects.filter(
+            updated_at__gte=_state['synced_at'] - timedelta(
+                seconds=settings.INGREDIENT_INDEX_SYNC_LAG
+            )
+        ).values_list('id', 'name'):
+            index.add(ingredient_id, name)
+        if (
+            deletions != _state['deletions']
+            or len(index.names) > Ingredient.objects.count()
+        ):
+            existing = set(Ingredient.objects.values_list('id', flat=True))
+            for ingredient_id in set(index.names) - existing:
+                index.remove(ingredient_id)
+    _state.update(synced_at=synced_at, deletions=deletions)
+
+
+def get_index():
+    """
+    Return the index, synced with the database at most every
+    INGREDIENT_INDEX_SYNC_INTERVAL seconds. Changes made in this process
+    are applied to it at once by the ingredient signals.
+    """
+    if _state['index'] is None:
+        observe_local_cache('ingredient_index', False)
+        return build()
+    observe_local_cache('ingredient_index', True)
+    if (
+        time.monotonic() - _state['checked_at']
+        >= settings.INGREDIENT_INDEX_SYNC_INTERVAL
+        and _sync_lock.acquire(blocking=False)
+    ):
+        # Searches meanwhile use the index as it is.
+        try:
+            _state['checked_at'] = time.monotonic()
+            sync()
+        finally:
+            _sync_lock.release()
+    return _state['index']
+
+
+def search(query, limit=None):
+    return get_index().search(
+        query, limit or settings.INGREDIENT_SEARCH_LIMIT
+    )
+
+
+def update(ingredient):
+    if _state['index'] is not None:
+        _state['index'].add(ingredient.id, ingredient.name)
+
+
+def remove(ingredient_id):
+    """Drop a deleted ingredient here and flag it to other processes."""
+    cache.add(DELETIONS_CACHE_KEY, 0, None)
+    cache.incr(DELETIONS_CACHE_KEY)
+    if _state['index'] is not None:
+        _state['index'].remove(ingredient_id)
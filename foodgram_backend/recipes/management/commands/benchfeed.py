@@ -0,0 +1,142 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes import feed
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscription, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarking the subscription feed: fan-out cost by follower '
+        'count and inbox reads compared to the pull query. '
+        'All generated data is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--followers', default='10,1000,10000',
+            help='Comma-separated follower counts to fan out to.'
+        )
+        parser.add_argument(
+            '--follows', default='10,100,500',
+            help='Comma-separated numbers of followed authors to read.'
+        )
+        parser.add_argument('--recipes-per-author', type=int, default=20)
+        parser.add_argument('--limit', type=int, default=6)
+
+    def timed(self, function, repeat=5):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best * 1000
+
+    def create_users(self, prefix, count):
+        User.objects.bulk_create(
+            [
+                User(
+                    email=f'{prefix}{index}@bench.local',
+                    username=f'{prefix}{index}',
+                    password='!'
+                )
+                for index in range(count)
+            ],
+            batch_size=1000
+        )
+        return list(User.objects.filter(
+            username__startswith=prefix
+        ).values_list('id', flat=True))
+
+    def create_recipes(self, author_ids, count):
+        Recipe.objects.bulk_create(
+            [
+                Recipe(
+                    author_id=author_id,
+                    name=f'bench-{author_id}-{index}',
+                    image='recipes_images/bench.png',
+                    text='',
+                    cooking_time=1
+                )
+                for author_id in author_ids
+                for index in range(count)
+            ],
+            batch_size=1000
+        )
+
+    def handle(self, *args, **options):
+        followers = [int(value) for value in options['followers'].split(',')]
+        follows = [int(value) for value in options['follows'].split(',')]
+        limit = options['limit']
+
+        with transaction.atomic():
+            subscriber_ids = self.create_users('bench-f-', max(followers))
+            author_ids = self.create_users('bench-a-', max(follows))
+            self.create_recipes(author_ids, options['recipes_per_author'])
+
+            for count in followers:
+                author_id = author_ids[count % len(author_ids)]
+                Subscription.objects.bulk_create(
+                    [
+                        Subscription(user_id=user_id, author_id=author_id)
+                        for user_id in subscriber_ids[:count]
+                    ],
+                    batch_size=1000,
+                    ignore_conflicts=True
+                )
+                feed.recount_followers([author_id])
+                recipe_id = Recipe.objects.filter(
+                    author_id=author_id
+                ).values_list('id', flat=True).first()
+                elapsed = self.timed(lambda: feed.fan_out(recipe_id), 1)
+                self.stdout.write(
+                    f'fan-out to {count} followers: {elapsed:.1f} ms'
+                )
+
+            for count in follows:
+                reader_id = self.create_users(f'bench-r{count}-', 1)[0]
+                reader = User.objects.get(pk=reader_id)
+                Subscription.objects.bulk_create(
+                    [
+                        Subscription(user_id=reader_id, author_id=author_id)
+                        for author_id in author_ids[:count]
+                    ]
+                )
+                FeedEntry.objects.bulk_create(
+                    [
+                        FeedEntry(
+                            user_id=reader_id,
+                            recipe_id=recipe_id,
+                            author_id=author_id,
+                            pub_date=pub_date
+                        )
+                        for recipe_id, author_id, pub_date in
+                        Recipe.objects.filter(
+                            author_id__in=author_ids[:count]
+                        ).values_list('id', 'author_id', 'pub_date')
+                    ],
+                    batch_size=1000
+                )
+
+                def pull():
+                    list(Recipe.objects.filter(
+                        author__in=Subscription.objects.filter(
+                            user_id=reader_id
+                        ).values('author')
+                    ).order_by('-pub_date', '-id').values_list(
+                        'pub_date', 'id'
+                    )[:limit])
+
+                def inbox():
+                    feed.page(reader, None, limit)
+
+                self.stdout.write(
+                    f'following {count} authors: '
+                    f'pull {self.timed(pull):.2f} ms, '
+                    f'inbox {self.timed(inbox):.2f} ms'
+                )
+            transaction.set_rollback(True)
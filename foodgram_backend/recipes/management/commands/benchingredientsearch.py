@@ -0,0 +1,104 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, transaction
+
+from recipes import ingredient_search
+from recipes.models import Ingredient
+
+
+def misspell(name, generator):
+    """Return the name with a typo or a changed word ending."""
+    position = generator.randrange(len(name))
+    kind = generator.choice(('drop', 'swap', 'replace', 'ending'))
+    if kind == 'drop' and len(name) > 3:
+        return name[:position] + name[position + 1:]
+    if kind == 'swap' and position < len(name) - 1:
+        return (
+            name[:position] + name[position + 1] + name[position]
+            + name[position + 2:]
+        )
+    if kind == 'replace':
+        return (
+            name[:position] + generator.choice('аеиоуыя')
+            + name[position + 1:]
+        )
+    return name[:-1] if len(name) > 4 else name + 'ы'
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarking the fuzzy ingredient index against database '
+        'ILIKE and trigram lookups on misspelled names.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        generator = random.Random(options['seed'])
+        ingredients = list(Ingredient.objects.values_list('id', 'name'))
+        if not ingredients:
+            self.stdout.write(self.style.ERROR('No ingredients to search.'))
+            return
+        queries = [
+            (ingredient_id, misspell(name, generator))
+            for ingredient_id, name in generator.choices(
+                ingredients, k=options['queries']
+            )
+        ]
+        limit = options['limit']
+
+        start = time.perf_counter()
+        ingredient_search.get_index()
+        self.stdout.write(
+            f'Index of {len(ingredients)} ingredients built in '
+            f'{(time.perf_counter() - start) * 1000:.1f} ms'
+        )
+
+        methods = [
+            ('index', lambda query: ingredient_search.search(query, limit)),
+            ('istartswith', lambda query: list(Ingredient.objects.filter(
+                name__istartswith=query
+            ).values_list('id', flat=True)[:limit])),
+            ('icontains', lambda query: list(Ingredient.objects.filter(
+                name__icontains=query
+            ).values_list('id', flat=True)[:limit])),
+        ]
+        if connection.vendor == 'postgresql':
+            from django.contrib.postgres.search import TrigramSimilarity
+
+            methods.append(('pg_trgm', lambda query: list(
+                Ingredient.objects.annotate(
+                    similarity=TrigramSimilarity('name', query)
+                ).filter(similarity__gte=0.3).order_by(
+                    '-similarity'
+                ).values_list('id', flat=True)[:limit]
+            )))
+
+        for method, lookup in methods:
+            timings = []
+            hits = 0
+            try:
+                with transaction.atomic():
+                    for ingredient_id, query in queries:
+                        started = time.perf_counter()
+                        found = lookup(query)
+                        timings.append(time.perf_counter() - started)
+                        hits += ingredient_id in found
+            except DatabaseError as error:
+                self.stdout.write(self.style.WARNING(
+                    f'{method}: skipped ({error})'
+                ))
+                continue
+            timings.sort()
+            self.stdout.write(self.style.SUCCESS(
+                f'{method}: mean '
+                f'{statistics.mean(timings) * 1000:.2f} ms, '
+                f'p95 {timings[int(len(timings) * 0.95)] * 1000:.2f} ms, '
+                f'found {hits / len(queries):.0%}'
+            ))
@@ -0,0 +1,42 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes import units
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = 'Benchmarking the shopping list aggregation on large carts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        generator = random.Random(options['seed'])
+        ingredients = list(
+            Ingredient.objects.values_list('name', 'measurement_unit')
+        ) or [('соль', 'г'), ('молоко', 'мл'), ('яйца', 'шт.')]
+        unit_variants = list(units.UNITS)
+        rows = []
+        for _ in range(options['rows']):
+            name, measurement_unit = generator.choice(ingredients)
+            if generator.random() < 0.3:
+                name = f' {name.upper()} '
+                measurement_unit = generator.choice(unit_variants)
+            rows.append((name, measurement_unit, generator.randint(1, 500)))
+
+        timings = []
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            lines = units.render(rows)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(rows)} rows -> {len(lines)} lines: '
+            f'best {best * 1000:.1f} ms, '
+            f'{len(rows) / best:,.0f} rows/s'
+        ))
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes import similarity
+
+
+class Command(BaseCommand):
+    help = 'Rebuilding the similar recipe lists of the whole catalogue.'
+
+    def handle(self, *args, **kwargs):
+        start = time.perf_counter()
+        count = similarity.rebuild_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'Similar recipes rebuilt for {count} recipes '
+            f'in {time.perf_counter() - start:.1f} s'
+        ))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes import deletion
+from recipes.background import enqueue
+
+
+class Command(BaseCommand):
+    help = (
+        'Deleting users or recipes with everything depending on them, '
+        'in small chunks with short transactions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, nargs='+', default=[])
+        parser.add_argument('--recipes', type=int, nargs='+', default=[])
+        parser.add_argument('--chunk-size', type=int)
+        parser.add_argument(
+            '--background', action='store_true',
+            help='Queue the deletion for runworker instead.'
+        )
+
+    def handle(self, *args, **options):
+        if not options['users'] and not options['recipes']:
+            raise CommandError('Pass --users or --recipes.')
+        chunk_size = options['chunk_size']
+        tasks = [
+            (deletion.delete_users, options['users']),
+            (deletion.delete_recipes, options['recipes']),
+        ]
+        for delete, ids in tasks:
+            if not ids:
+                continue
+            if options['background']:
+                enqueue(delete, ids, chunk_size)
+                self.stdout.write(f'{delete.__name__} queued for {ids}')
+                continue
+            counts = delete(ids, chunk_size, progress=self.report)
+            self.stdout.write(self.style.SUCCESS(
+                f'Done: {sum(counts.values())} rows deleted'
+            ))
+
+    def report(self, counts):
+        self.stdout.write(
+            ', '.join(f'{label}: {count}' for label, count in counts.items()),
+            ending='\r'
+        )
+        self.stdout.flush()
@@ -0,0 +1,241 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, Min, Sum, When
+
+from recipes import nutrition, shopping_list, similarity, units
+from recipes.background import enqueue
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingListItem
+)
+from recipes.signals import recipes_changed
+
+NUTRITION_FIELDS = ('unit_weight', 'kcal', 'protein', 'fat', 'carbs', 'price')
+
+
+class Command(BaseCommand):
+    help = (
+        'Merging ingredients whose names differ only in case, whitespace '
+        'or Unicode form and whose units are the same, repointing recipe '
+        'lines to the most used one of each cluster.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report the clusters that would be merged.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of ingredients merged in one transaction.'
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        clusters = self.clusters()
+        if options['dry_run'] or options['verbosity'] > 1:
+            for winner, *losers in clusters:
+                self.stdout.write(
+                    f'{winner} #{winner.id} ({winner.lines} lines) <- '
+                    + ', '.join(
+                        f'"{loser.name}" #{loser.id} ({loser.lines} lines)'
+                        for loser in losers
+                    )
+                )
+        losers = sum(len(cluster) - 1 for cluster in clusters)
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f'{len(clusters)} clusters, {losers} ingredients to merge'
+            ))
+            return
+        merged = repointed = 0
+        capped = []
+        for batch in self.batches(clusters):
+            batch_merged, batch_repointed, batch_capped = self.merge(batch)
+            merged += batch_merged
+            repointed += batch_repointed
+            capped.extend(batch_capped)
+        if clusters:
+            enqueue(similarity.rebuild_all, key='similarity:all')
+        for recipe_id, ingredient_id, total in capped:
+            self.stdout.write(self.style.WARNING(
+                f'Recipe #{recipe_id}: merged amount {total} of ingredient '
+                f'#{ingredient_id} capped at {settings.MAX_AMOUNT_VALUE}'
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(clusters)} clusters, {losers} ingredients merged, '
+            f'{repointed} lines repointed, {merged} duplicate lines merged, '
+            f'{len(capped)} amounts capped'
+        ))
+
+    def clusters(self):
+        """
+        Return the lists of duplicate ingredients, the one to keep first:
+        the most used, then the one with nutrition values, then the oldest.
+        """
+        groups = defaultdict(list)
+        for ingredient in Ingredient.objects.order_by('id').iterator(
+            chunk_size=self.batch_size
+        ):
+            groups[(
+                units.normalize_text(ingredient.name),
+                units.resolve_unit(ingredient.measurement_unit),
+            )].append(ingredient)
+        clusters = [group for group in groups.values() if len(group) > 1]
+        lines = dict(
+            RecipeIngredient.objects.values_list('ingredient_id').annotate(
+                lines=Count('id')
+            ).order_by()
+        ) if clusters else {}
+        for group in clusters:
+            for ingredient in group:
+                ingredient.lines = lines.get(ingredient.id, 0)
+            group.sort(key=lambda ingredient: (
+                -ingredient.lines, ingredient.kcal is None, ingredient.id
+            ))
+        return clusters
+
+    def batches(self, clusters):
+        """Group whole clusters into batches of about batch_size losers."""
+        batch = []
+        size = 0
+        for cluster in clusters:
+            batch.append(cluster)
+            size += len(cluster) - 1
+            if size >= self.batch_size:
+                yield batch
+                batch = []
+                size = 0
+        if batch:
+            yield batch
+
+    def chunks(self, values):
+        for start in range(0, len(values), self.batch_size):
+            yield values[start:start + self.batch_size]
+
+    @transaction.atomic
+    def merge(self, clusters):
+        """
+        Move the recipe lines of the duplicates to the ingredient kept in
+        their cluster and delete the duplicates. Lines of one recipe ending
+        up with the same ingredient are summed into the first of them,
+        capped at MAX_AMOUNT_VALUE. Returns the number of merged lines, of
+        repointed lines, and the (recipe_id, ingredient_id, amount) of the
+        capped sums.
+        """
+        loser_ids = [
+            ingredient.id for cluster in clusters for ingredient in cluster[1:]
+        ]
+        recipe_ids = list(
+            RecipeIngredient.objects.filter(
+                ingredient_id__in=loser_ids
+            ).values_list('recipe_id', flat=True).distinct().order_by()
+        )
+        user_ids = list(
+            ShoppingListItem.objects.filter(
+                ingredient_id__in=loser_ids
+            ).values_list('user_id', flat=True).distinct().order_by()
+        )
+
+        merged, capped = self.merge_collisions(clusters, loser_ids)
+        repointed = 0
+        for winner, *losers in clusters:
+            repointed += RecipeIngredient.objects.filter(
+                ingredient_id__in=[loser.id for loser in losers]
+            ).update(ingredient_id=winner.id)
+            self.complete(winner, losers)
+        Ingredient.objects.filter(id__in=loser_ids).delete()
+
+        for batch in self.chunks(recipe_ids):
+            nutrition.recalculate(batch)
+            recipes_changed.send(sender=Recipe, recipe_ids=batch)
+        shopping_list.rebuild(user_ids)
+        return merged, repointed, capped
+
+    def merge_collisions(self, clusters, loser_ids):
+        """
+        Sum the lines of one recipe that would point to the same kept
+        ingredient into the first of them and delete the others, found
+        with one grouped query. Returns the number of deleted lines and
+        the capped sums.
+        """
+        collisions = RecipeIngredient.objects.filter(
+            recipe_id__in=RecipeIngredient.objects.filter(
+                ingredient_id__in=loser_ids
+            ).values('recipe_id'),
+            ingredient_id__in=[
+                ingredient.id for cluster in clusters for ingredient in cluster
+            ]
+        ).annotate(
+            target=Case(
+                *(
+                    When(
+                        ingredient_id__in=[
+                            ingredient.id for ingredient in cluster
+                        ],
+                        then=cluster[0].id
+                    )
+                    for cluster in clusters
+                ),
+                output_field=IntegerField()
+            )
+        ).values('recipe_id', 'target').annotate(
+            lines=Count('id'), total=Sum('amount'), first=Min('id')
+        ).filter(lines__gt=1).order_by()
+
+        kept = []
+        capped = []
+        firsts = defaultdict(list)
+        for collision in collisions:
+            amount = collision['total']
+            if amount > settings.MAX_AMOUNT_VALUE:
+                capped.append(
+                    (collision['recipe_id'], collision['target'], amount)
+                )
+                amount = settings.MAX_AMOUNT_VALUE
+            kept.append(RecipeIngredient(id=collision['first'], amount=amount))
+            firsts[collision['target']].append(
+                (collision['recipe_id'], collision['first'])
+            )
+        merged = 0
+        for winner, *losers in clusters:
+            if winner.id not in firsts:
+                continue
+            for batch in self.chunks(firsts[winner.id]):
+                merged += RecipeIngredient.objects.filter(
+                    recipe_id__in=[recipe_id for recipe_id, _ in batch],
+                    ingredient_id__in=[
+                        ingredient.id for ingredient in (winner, *losers)
+                    ]
+                ).exclude(id__in=[first for _, first in batch]).delete()[0]
+        RecipeIngredient.objects.bulk_update(
+            kept, ['amount'], batch_size=self.batch_size
+        )
+        return merged, capped
+
+    @staticmethod
+    def complete(winner, losers):
+        """
+        Copy to the kept ingredient the nutrition values only known for
+        its duplicates, and fold the whitespace of its name.
+        """
+        fields = []
+        for field in NUTRITION_FIELDS:
+            value = next((
+                getattr(loser, field) for loser in losers
+                if getattr(loser, field) is not None
+            ), None)
+            if getattr(winner, field) is None and value is not None:
+                setattr(winner, field, value)
+                fields.append(field)
+        name = ' '.join(winner.name.split())
+        if name != winner.name:
+            winner.name = name
+            fields.append('name')
+        if fields:
+            winner.save(update_fields=[*fields, 'updated_at'])
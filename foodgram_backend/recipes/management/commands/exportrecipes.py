@@ -0,0 +1,97 @@
+import json
+import sys
+import time
+from collections import defaultdict
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+
+from recipes import tag_bits
+from recipes.models import Recipe, RecipeIngredient
+
+RECIPE_FIELDS = (
+    'id', 'name', 'text', 'image', 'image_width', 'image_height',
+    'image_placeholder', 'cooking_time', 'pub_date', 'tags_mask',
+    'author__email', 'author__username',
+    'author__first_name', 'author__last_name',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Exporting recipes with their authors, tags and ingredient lines '
+        'as JSON Lines. Images are exported as references to files in '
+        'MEDIA_ROOT, which have to be copied separately.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default='-',
+            help='File to write to, the standard output by default.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options['output'] == '-':
+            count = self.export(sys.stdout, options['batch_size'])
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                count = self.export(file, options['batch_size'])
+        self.stderr.write(self.style.SUCCESS(
+            f'{count} recipes exported '
+            f'in {time.perf_counter() - start:.1f} s'
+        ))
+
+    def export(self, file, batch_size):
+        recipes = Recipe.objects.order_by('id').values(
+            *RECIPE_FIELDS
+        ).iterator(chunk_size=batch_size)
+        count = 0
+        while True:
+            batch = list(islice(recipes, batch_size))
+            if not batch:
+                return count
+            lines = defaultdict(list)
+            for recipe_id, name, measurement_unit, amount in (
+                RecipeIngredient.objects.filter(
+                    recipe_id__in=[recipe['id'] for recipe in batch]
+                ).order_by('id').values_list(
+                    'recipe_id',
+                    'ingredient__name',
+                    'ingredient__measurement_unit',
+                    'amount'
+                )
+            ):
+                lines[recipe_id].append({
+                    'name': name,
+                    'measurement_unit': measurement_unit,
+                    'amount': amount,
+                })
+            for recipe in batch:
+                file.write(json.dumps({
+                    'id': recipe['id'],
+                    'author': {
+                        'email': recipe['author__email'],
+                        'username': recipe['author__username'],
+                        'first_name': recipe['author__first_name'],
+                        'last_name': recipe['author__last_name'],
+                    },
+                    'name': recipe['name'],
+                    'text': recipe['text'],
+                    'image': recipe['image'],
+                    'image_width': recipe['image_width'],
+                    'image_height': recipe['image_height'],
+                    'image_placeholder': recipe['image_placeholder'],
+                    'cooking_time': recipe['cooking_time'],
+                    'pub_date': recipe['pub_date'].isoformat(),
+                    'tags': [
+                        {'name': tag.name, 'color': tag.color,
+                         'slug': tag.slug}
+                        for tag in tag_bits.tags_for_mask(
+                            recipe['tags_mask']
+                        )
+                    ],
+                    'ingredients': lines[recipe['id']],
+                }, ensure_ascii=False) + '\n')
+            count += len(batch)
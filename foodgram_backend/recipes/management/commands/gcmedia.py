@@ -0,0 +1,186 @@
+import os
+import time
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from recipes import images
+from recipes.models import Recipe, StoredImage
+
+
+def walk(path):
+    """Yield the files under a directory, without listing it at once."""
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from walk(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+
+
+class Command(BaseCommand):
+    help = (
+        'Deleting recipe images no recipe uses, going through the media '
+        'directory in batches, after recounting the references of stored '
+        'images. Optionally moves images stored under upload names to '
+        'content-addressed storage first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report the files that would be deleted.'
+        )
+        parser.add_argument(
+            '--adopt', action='store_true',
+            help=(
+                'Store the images of recipes still using upload names by '
+                'content, merging identical ones.'
+            )
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=settings.MEDIA_GC_MIN_AGE,
+            help='Seconds an unused file is kept for after its upload.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.options = options
+        try:
+            root = default_storage.path(images.IMAGE_DIR)
+        except NotImplementedError:
+            raise CommandError('The media storage has no local directory.')
+        start = time.perf_counter()
+        if options['adopt']:
+            self.adopt()
+        if not options['dry_run']:
+            self.recount()
+        cutoff = time.time() - options['min_age']
+        self.uploaded_before = timezone.now() - timedelta(
+            seconds=options['min_age']
+        )
+        scanned = deleted = freed = 0
+        files = walk(root) if os.path.isdir(root) else iter(())
+        while True:
+            batch = list(islice(files, options['batch_size']))
+            if not batch:
+                break
+            scanned += len(batch)
+            garbage = self.garbage(
+                {
+                    os.path.relpath(entry.path, settings.MEDIA_ROOT).replace(
+                        os.sep, '/'
+                    ): entry.stat()
+                    for entry in batch
+                },
+                cutoff
+            )
+            if not options['dry_run']:
+                garbage = {
+                    name: garbage[name] for name in self.delete(garbage)
+                }
+            deleted += len(garbage)
+            freed += sum(garbage.values())
+        if not options['dry_run']:
+            # Stored images whose file is already gone.
+            StoredImage.objects.filter(
+                references=0, created_at__lt=self.uploaded_before
+            ).delete()
+        verb = 'to delete' if options['dry_run'] else 'deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{scanned} files scanned, {deleted} unused {verb} '
+            f'({freed / 2 ** 20:.1f} MiB) in '
+            f'{time.perf_counter() - start:.1f} s'
+        ))
+
+    def garbage(self, files, cutoff):
+        """Return the sizes of the old files no recipe uses, by name."""
+        names = [
+            name for name, stat in files.items() if stat.st_mtime < cutoff
+        ]
+        used = set(
+            Recipe.objects.filter(image__in=names).values_list(
+                'image', flat=True
+            )
+        )
+        recent = set(
+            StoredImage.objects.filter(
+                name__in=names, created_at__gte=self.uploaded_before
+            ).values_list('name', flat=True)
+        )
+        return {
+            name: files[name].st_size for name in names
+            if name not in used and name not in recent
+        }
+
+    @transaction.atomic
+    def delete(self, garbage):
+        """
+        Delete the files still unused with their stored images and return
+        their names. The stored images are locked before the recipes are
+        checked again, as an upload may have found one since the scan:
+        images.find() marks it as just uploaded, or waits for the lock
+        and finds nothing.
+        """
+        names = list(garbage)
+        uploaded_at = dict(
+            StoredImage.objects.select_for_update().filter(
+                name__in=names
+            ).values_list('name', 'created_at')
+        )
+        used = set(
+            Recipe.objects.filter(image__in=names).values_list(
+                'image', flat=True
+            )
+        )
+        deleted = [
+            name for name in names
+            if name not in used and (
+                name not in uploaded_at
+                or uploaded_at[name] < self.uploaded_before
+            )
+        ]
+        StoredImage.objects.filter(name__in=deleted).delete()
+        for name in deleted:
+            default_storage.delete(name)
+        return deleted
+
+    def recount(self):
+        """Fix the reference counts missed by bulk inserts and deletes."""
+        last_id = 0
+        while True:
+            batch = list(
+                StoredImage.objects.filter(id__gt=last_id).order_by(
+                    'id'
+                ).values_list('id', 'name')[:self.options['batch_size']]
+            )
+            if not batch:
+                return
+            last_id = batch[-1][0]
+            images.recount([name for _, name in batch])
+
+    def adopt(self):
+        """Store the images of recipes under upload names by content."""
+        stored = StoredImage.objects.values('name')
+        names = list(
+            Recipe.objects.exclude(image='').exclude(
+                image__in=stored
+            ).values_list('image', flat=True).distinct().order_by()
+        )
+        adopted = missing = 0
+        for name in [] if self.options['dry_run'] else names:
+            try:
+                images.adopt(name)
+            except OSError:
+                missing += 1
+                continue
+            adopted += 1
+        self.stdout.write(
+            f'{len(names)} images under upload names, {adopted} adopted, '
+            f'{missing} missing'
+        )
@@ -2,12 +2,26 @@ import csv
 
 from django.core.management.base import BaseCommand
 
+from recipes import nutrition
 from recipes.models import Ingredient
 
+NUTRITION_FIELDS = ('unit_weight', 'kcal', 'protein', 'fat', 'carbs', 'price')
+
 
 class Command(BaseCommand):
     help = 'Importing ingredients from a CSV file.'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--nutrition',
+            action='store_true',
+            help=(
+                'Also load nutrition values and prices from '
+                'recipes/data/ingredient_nutrition.csv and recompute '
+                'the recipes using the updated ingredients.'
+            )
+        )
+
     def handle(self, *args, **kwargs):
         with open(
             'recipes/data/ingredients.csv', 'r', encoding='utf-8'
@@ -23,3 +37,36 @@ class Command(BaseCommand):
                 self.stdout.write(
                     self.style.SUCCESS(f'Ingredient imported: {name}')
                 )
+
+        if kwargs['nutrition']:
+            self.import_nutrition()
+
+    def import_nutrition(self):
+        with open(
+            'recipes/data/ingredient_nutrition.csv', 'r', encoding='utf-8'
+        ) as file:
+            rows = {
+                (row['name'], row['measurement_unit']): row
+                for row in csv.DictReader(file)
+            }
+
+        ingredients = []
+        for ingredient in Ingredient.objects.filter(
+            name__in={name for name, _ in rows}
+        ):
+            row = rows.get((ingredient.name, ingredient.measurement_unit))
+            if row is None:
+                continue
+            for field in NUTRITION_FIELDS:
+                setattr(ingredient, field, row[field] or None)
+            ingredients.append(ingredient)
+
+        Ingredient.objects.bulk_update(
+            ingredients, NUTRITION_FIELDS, batch_size=1000
+        )
+        nutrition.recalculate_for_ingredients(
+            [ingredient.id for ingredient in ingredients]
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Nutrition values imported for {len(ingredients)} ingredients'
+        ))
@@ -0,0 +1,139 @@
+import json
+import sys
+import time
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from recipes import bulk, similarity
+from recipes.background import enqueue
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.signals import recipes_changed
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Importing recipes written by exportrecipes. Recipes get new ids, '
+        'missing authors, tags and ingredients are created. Image files '
+        'have to be copied to MEDIA_ROOT separately.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--input', default='-',
+            help='File to read from, the standard input by default.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--id-map',
+            help='CSV file to write the exported and the new recipe ids to.'
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        self.tags = {tag.slug: tag for tag in Tag.objects.all()}
+        self.ingredients = {
+            (name, measurement_unit): ingredient_id
+            for ingredient_id, name, measurement_unit
+            in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        }
+        self.id_map = (
+            open(options['id_map'], 'w', encoding='utf-8')
+            if options['id_map'] else None
+        )
+        file = (
+            sys.stdin if options['input'] == '-'
+            else open(options['input'], encoding='utf-8')
+        )
+        records = (json.loads(line) for line in file if line.strip())
+        count = 0
+        try:
+            while True:
+                batch = list(islice(records, options['batch_size']))
+                if not batch:
+                    break
+                self.import_batch(batch)
+                count += len(batch)
+                self.stderr.write(f'{count} recipes imported', ending='\r')
+        finally:
+            if file is not sys.stdin:
+                file.close()
+            if self.id_map:
+                self.id_map.close()
+        if count:
+            enqueue(similarity.rebuild_all, key='similarity:all')
+        self.stderr.write(self.style.SUCCESS(
+            f'{count} recipes imported '
+            f'in {time.perf_counter() - start:.1f} s'
+        ))
+
+    @transaction.atomic
+    def import_batch(self, records):
+        authors = self.authors(records)
+        recipes = [
+            Recipe(
+                author_id=authors[record['author']['email']],
+                name=record['name'],
+                text=record['text'],
+                image=record['image'],
+                # Missing from exports of older versions.
+                image_width=record.get('image_width'),
+                image_height=record.get('image_height'),
+                image_placeholder=record.get('image_placeholder', ''),
+                cooking_time=record['cooking_time'],
+                pub_date=parse_datetime(record['pub_date']),
+            )
+            for record in records
+        ]
+        bulk.create_recipes(
+            recipes,
+            [
+                [
+                    (self.ingredient_id(line), line['amount'])
+                    for line in record['ingredients']
+                ]
+                for record in records
+            ],
+            [[self.tag(tag) for tag in record['tags']] for record in records]
+        )
+        recipes_changed.send(
+            sender=Recipe, recipe_ids=[recipe.id for recipe in recipes]
+        )
+        if self.id_map:
+            self.id_map.writelines(
+                f'{record["id"]},{recipe.id}\n'
+                for recipe, record in zip(recipes, records)
+            )
+
+    def authors(self, records):
+        """Return the user ids by email, creating the missing users."""
+        authors = dict(User.objects.filter(
+            email__in={record['author']['email'] for record in records}
+        ).values_list('email', 'id'))
+        for record in records:
+            if record['author']['email'] not in authors:
+                user = User(**record['author'])
+                user.set_unusable_password()
+                user.save()
+                authors[user.email] = user.id
+        return authors
+
+    def tag(self, tag):
+        if tag['slug'] not in self.tags:
+            self.tags[tag['slug']] = Tag.objects.create(**tag)
+        return self.tags[tag['slug']]
+
+    def ingredient_id(self, line):
+        key = (line['name'], line['measurement_unit'])
+        if key not in self.ingredients:
+            self.ingredients[key] = Ingredient.objects.create(
+                name=line['name'], measurement_unit=line['measurement_unit']
+            ).id
+        return self.ingredients[key]
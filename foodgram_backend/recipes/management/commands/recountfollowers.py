@@ -0,0 +1,37 @@
+import time
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from recipes import feed
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Recounting the followers of every author, fixing the counts '
+        'missed by bulk inserts and deletes, and moving the authors whose '
+        'count crossed the threshold to the matching feed path.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        author_ids = User.objects.order_by('id').values_list(
+            'id', flat=True
+        ).iterator(chunk_size=options['batch_size'])
+        count = 0
+        while True:
+            batch = list(islice(author_ids, options['batch_size']))
+            if not batch:
+                break
+            feed.recount_followers(batch)
+            count += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Followers recounted for {count} users '
+            f'in {time.perf_counter() - start:.1f} s'
+        ))
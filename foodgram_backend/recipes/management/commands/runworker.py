@@ -0,0 +1,106 @@
+import multiprocessing
+import signal
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait
+)
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections
+
+from recipes import background
+
+# Seconds between checks for stale and old jobs.
+MAINTENANCE_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = 'Running queued background jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int,
+            default=settings.JOB_WORKER_CONCURRENCY
+        )
+        parser.add_argument(
+            '--pool', choices=('thread', 'process'), default='thread'
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once no job is due.'
+        )
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        if options['pool'] == 'process':
+            connections.close_all()
+            executor = ProcessPoolExecutor(
+                concurrency,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup
+            )
+        else:
+            executor = ThreadPoolExecutor(
+                concurrency, thread_name_prefix='worker'
+            )
+
+        stopping = []
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stopping.append(True))
+
+        self.stdout.write(
+            f'Worker started with {concurrency} {options["pool"]}s'
+        )
+        running = {}
+        maintained_at = beaten_at = 0.0
+        processed = 0
+        with executor:
+            while not stopping:
+                if (
+                    running and time.monotonic() - beaten_at
+                    >= settings.JOB_HEARTBEAT_INTERVAL
+                ):
+                    try:
+                        background.heartbeat(list(running.values()))
+                        beaten_at = time.monotonic()
+                    except DatabaseError as error:
+                        self.stderr.write(f'Could not extend leases: {error}')
+                if time.monotonic() - maintained_at > MAINTENANCE_INTERVAL:
+                    background.requeue_stale()
+                    background.purge()
+                    maintained_at = time.monotonic()
+                failed = False
+                if len(running) < concurrency:
+                    try:
+                        for job_id in background.claim(
+                            concurrency - len(running)
+                        ):
+                            running[
+                                executor.submit(background.run, job_id)
+                            ] = job_id
+                    except DatabaseError as error:
+                        failed = True
+                        self.stderr.write(f'Could not claim jobs: {error}')
+                if not running:
+                    if options['once'] and not failed:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                done, _ = wait(
+                    running,
+                    timeout=options['poll_interval'],
+                    return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    del running[future]
+                processed += len(done)
+            wait(running)
+        self.stdout.write(self.style.SUCCESS(
+            f'Worker stopped after {processed + len(running)} jobs'
+        ))
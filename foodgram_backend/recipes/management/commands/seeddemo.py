@@ -0,0 +1,316 @@
+import io
+import random
+import time
+from collections import defaultdict
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from PIL import Image
+
+from recipes import bulk, feed, images, shopping_list, similarity
+from recipes.background import enqueue
+from recipes.models import (
+    Favorite,
+    FeedEntry,
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    Tag
+)
+from recipes.signals import recipes_changed
+from users.models import Subscription
+
+User = get_user_model()
+
+DEFAULT_TAGS = (
+    ('Breakfast', '#E26C2D', 'breakfast'),
+    ('Lunch', '#49B64E', 'lunch'),
+    ('Dinner', '#8775D2', 'dinner'),
+)
+
+
+class Zipf:
+    """
+    Sampler picking items with a probability falling as a power of their
+    rank, so a few items get most picks. Ranks are shuffled, so
+    popularity does not follow the order of the items.
+    """
+
+    def __init__(self, items, exponent, generator):
+        self.items = list(items)
+        generator.shuffle(self.items)
+        self.weights = list(accumulate(
+            1 / rank ** exponent for rank in range(1, len(self.items) + 1)
+        ))
+        self.generator = generator
+
+    def sample(self, count=1):
+        return self.generator.choices(
+            self.items, cum_weights=self.weights, k=count
+        )
+
+    def distinct(self, count):
+        """Return up to count different items."""
+        return set(self.sample(count))
+
+
+class Command(BaseCommand):
+    help = (
+        'Generating demo users, recipes, favorites, carts and '
+        'subscriptions with Zipf-like popularity, for sizing and '
+        'load tests. Ingredients have to be imported first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--favorites', type=int, default=20000)
+        parser.add_argument('--carts', type=int, default=3000)
+        parser.add_argument('--subscriptions', type=int, default=10000)
+        parser.add_argument('--images', type=int, default=12)
+        parser.add_argument(
+            '--exponent', type=float, default=1.1,
+            help='Exponent of the popularity distributions.'
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--prefix', default='demo')
+        parser.add_argument('--password', default='demo-password')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.generator = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}-').exists():
+            raise CommandError(
+                f'Users named {prefix}-* exist. Delete them with '
+                f'chunkeddelete or pass another --prefix.'
+            )
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if not ingredient_ids:
+            raise CommandError(
+                'No ingredients, run importingredients first.'
+            )
+
+        start = time.perf_counter()
+        user_ids = self.create_users()
+        self.step(f'{len(user_ids)} users', start)
+        stored_images = self.create_images()
+        authors = Zipf(user_ids, options['exponent'], self.generator)
+        recipe_ids = self.create_recipes(
+            authors,
+            Zipf(ingredient_ids, options['exponent'], self.generator),
+            Zipf(self.tags(), options['exponent'], self.generator),
+            stored_images
+        )
+        self.step(f'{len(recipe_ids)} recipes', start)
+
+        users = Zipf(user_ids, options['exponent'], self.generator)
+        recipes = Zipf(recipe_ids, options['exponent'], self.generator)
+        self.create_favorites(users, recipes)
+        self.create_carts(users, recipes)
+        self.step('favorites and carts', start)
+        self.create_subscriptions(users, authors)
+        self.step('subscriptions and feeds', start)
+        enqueue(similarity.rebuild_all, key='similarity:all')
+        self.stdout.write(self.style.SUCCESS(
+            f'Demo data generated in {time.perf_counter() - start:.1f} s. '
+            f'Users log in as {prefix}-<n>@demo.local with the password '
+            f'{options["password"]}.'
+        ))
+
+    def step(self, label, start):
+        self.stdout.write(
+            f'{label} done at {time.perf_counter() - start:.1f} s'
+        )
+
+    def batches(self, items):
+        items = iter(items)
+        while True:
+            batch = list(islice(items, self.batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def create_users(self):
+        prefix = self.options['prefix']
+        # One hash for everyone, as hashing is slow on purpose.
+        password = make_password(self.options['password'])
+        User.objects.bulk_create(
+            [
+                User(
+                    email=f'{prefix}-{index}@demo.local',
+                    username=f'{prefix}-{index}',
+                    first_name='Demo',
+                    last_name=f'User {index}',
+                    password=password
+                )
+                for index in range(self.options['users'])
+            ],
+            batch_size=self.batch_size
+        )
+        return list(User.objects.filter(
+            username__startswith=f'{prefix}-'
+        ).values_list('id', flat=True))
+
+    def create_images(self):
+        stored_images = []
+        for _ in range(self.options['images']):
+            image = Image.new('RGB', (600, 400), tuple(
+                self.generator.randrange(256) for _ in range(3)
+            ))
+            file = io.BytesIO()
+            image.save(file, 'JPEG', quality=85)
+            stored_images.append(images.store(file.getvalue(), 'jpg'))
+        return stored_images
+
+    def tags(self):
+        tags = list(Tag.objects.all())
+        if not tags:
+            tags = [
+                Tag.objects.create(name=name, color=color, slug=slug)
+                for name, color, slug in DEFAULT_TAGS
+            ]
+        return tags
+
+    def create_recipes(self, authors, ingredients, tags, stored_images):
+        generator = self.generator
+        now = timezone.now()
+        recipe_ids = []
+        for batch in self.batches(range(self.options['recipes'])):
+            recipes = [
+                Recipe(
+                    author_id=author_id,
+                    name=f'Demo recipe {index}',
+                    text=f'Demo recipe {index}, cooked the usual way.',
+                    **images.recipe_fields(generator.choice(stored_images)),
+                    cooking_time=generator.randint(5, 180),
+                    pub_date=now - timedelta(
+                        seconds=generator.randrange(
+                            self.options['days'] * 24 * 60 * 60
+                        )
+                    )
+                )
+                for index, author_id in zip(
+                    batch, authors.sample(len(batch))
+                )
+            ]
+            bulk.create_recipes(
+                recipes,
+                [
+                    [
+                        (ingredient_id, generator.randint(
+                            settings.MIN_AMOUNT_VALUE, 500
+                        ))
+                        for ingredient_id in ingredients.distinct(
+                            generator.randint(3, 12)
+                        )
+                    ]
+                    for _ in recipes
+                ],
+                [tags.distinct(generator.randint(1, 3)) for _ in recipes]
+            )
+            recipes_changed.send(
+                sender=Recipe,
+                recipe_ids=[recipe.id for recipe in recipes]
+            )
+            recipe_ids.extend(recipe.id for recipe in recipes)
+        return recipe_ids
+
+    def pairs(self, first, second, count):
+        """
+        Return count distinct pairs of sampled items. Popular items pair
+        up again and again, so sampling is repeated a few times.
+        """
+        pairs = set()
+        for _ in range(10):
+            missing = count - len(pairs)
+            if missing <= 0:
+                break
+            pairs.update(zip(first.sample(missing), second.sample(missing)))
+        return pairs
+
+    def create_favorites(self, users, recipes):
+        for batch in self.batches(
+            self.pairs(users, recipes, self.options['favorites'])
+        ):
+            Favorite.objects.bulk_create(
+                [
+                    Favorite(user_id=user_id, recipe_id=recipe_id)
+                    for user_id, recipe_id in batch
+                ],
+                ignore_conflicts=True
+            )
+
+    def create_carts(self, users, recipes):
+        pairs = self.pairs(users, recipes, self.options['carts'])
+        for batch in self.batches(pairs):
+            ShoppingCart.objects.bulk_create(
+                [
+                    ShoppingCart(
+                        user_id=user_id,
+                        recipe_id=recipe_id,
+                        servings=self.generator.randint(1, 4)
+                    )
+                    for user_id, recipe_id in batch
+                ],
+                ignore_conflicts=True
+            )
+        for batch in self.batches({user_id for user_id, _ in pairs}):
+            shopping_list.rebuild(batch)
+
+    def create_subscriptions(self, users, authors):
+        pairs = {
+            (user_id, author_id)
+            for user_id, author_id in self.pairs(
+                users, authors, self.options['subscriptions']
+            )
+            if user_id != author_id
+        }
+        for batch in self.batches(pairs):
+            Subscription.objects.bulk_create(
+                [
+                    Subscription(user_id=user_id, author_id=author_id)
+                    for user_id, author_id in batch
+                ],
+                ignore_conflicts=True
+            )
+        for batch in self.batches({author_id for _, author_id in pairs}):
+            feed.recount_followers(batch)
+        pull_authors = feed.pull_authors()
+
+        followers = defaultdict(list)
+        for user_id, author_id in pairs:
+            if author_id not in pull_authors:
+                followers[author_id].append(user_id)
+        for batch in self.batches(followers):
+            latest = defaultdict(list)
+            for recipe_id, author_id, pub_date in Recipe.objects.filter(
+                author_id__in=batch
+            ).order_by('-pub_date', '-id').values_list(
+                'id', 'author_id', 'pub_date'
+            ):
+                if len(latest[author_id]) < settings.FEED_BACKFILL_SIZE:
+                    latest[author_id].append((recipe_id, pub_date))
+            entries = (
+                FeedEntry(
+                    user_id=user_id,
+                    recipe_id=recipe_id,
+                    author_id=author_id,
+                    pub_date=pub_date
+                )
+                for author_id in batch
+                for user_id in followers[author_id]
+                for recipe_id, pub_date in latest[author_id]
+            )
+            for entries_batch in self.batches(entries):
+                FeedEntry.objects.bulk_create(
+                    entries_batch, ignore_conflicts=True
+                )
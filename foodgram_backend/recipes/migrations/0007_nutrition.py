@@ -0,0 +1,66 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_similar_recipes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='unit_weight',
+            field=models.FloatField(blank=True, help_text='Required for units that are not mass or volume', null=True, verbose_name='Grams in one measurement unit'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='kcal',
+            field=models.FloatField(blank=True, null=True, verbose_name='Calories per 100 g'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='protein',
+            field=models.FloatField(blank=True, null=True, verbose_name='Protein per 100 g'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='fat',
+            field=models.FloatField(blank=True, null=True, verbose_name='Fat per 100 g'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='carbs',
+            field=models.FloatField(blank=True, null=True, verbose_name='Carbohydrates per 100 g'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Price per 100 g'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='kcal',
+            field=models.FloatField(blank=True, db_index=True, null=True, verbose_name='Calories'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='protein',
+            field=models.FloatField(blank=True, db_index=True, null=True, verbose_name='Protein, g'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='fat',
+            field=models.FloatField(blank=True, null=True, verbose_name='Fat, g'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='carbs',
+            field=models.FloatField(blank=True, null=True, verbose_name='Carbohydrates, g'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='cost',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=2, max_digits=10, null=True, verbose_name='Estimated cost'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations, models
+
+
+def fill_tag_bits(apps, schema_editor):
+    Tag = apps.get_model('recipes', 'Tag')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    bits = {}
+    for bit, tag in enumerate(Tag.objects.order_by('id')):
+        tag.bit = bits[tag.id] = bit
+        tag.save(update_fields=('bit',))
+    masks = {}
+    for recipe_id, tag_id in Recipe.tags.through.objects.values_list(
+        'recipe_id', 'tag_id'
+    ).iterator():
+        masks[recipe_id] = masks.get(recipe_id, 0) | 1 << bits[tag_id]
+    Recipe.objects.bulk_update(
+        [Recipe(pk=recipe_id, tags_mask=mask)
+         for recipe_id, mask in masks.items()],
+        ('tags_mask',),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_nutrition'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='bit',
+            field=models.PositiveSmallIntegerField(editable=False, null=True, verbose_name='Bit in the recipe tag mask'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tags_mask',
+            field=models.BigIntegerField(default=0, editable=False, help_text='Kept in sync with the tags', verbose_name='Tag bits'),
+        ),
+        migrations.RunPython(fill_tag_bits, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tag',
+            name='bit',
+            field=models.PositiveSmallIntegerField(editable=False, unique=True, verbose_name='Bit in the recipe tag mask'),
+        ),
+    ]
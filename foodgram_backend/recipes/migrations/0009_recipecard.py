@@ -0,0 +1,25 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_tag_mask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeCard',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='recipes.recipe', verbose_name='Recipe')),
+                ('data', models.JSONField(verbose_name='Rendered author, tags and ingredients')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Last rebuilt')),
+            ],
+            options={
+                'verbose_name': 'Recipe card',
+                'verbose_name_plural': 'Recipe cards',
+                'ordering': ('recipe',),
+            },
+        ),
+    ]
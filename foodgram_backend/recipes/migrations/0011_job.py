@@ -0,0 +1,41 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('function', models.CharField(max_length=255, verbose_name='Dotted path of the function')),
+                ('args', models.JSONField(default=list, verbose_name='Positional arguments')),
+                ('key', models.CharField(blank=True, help_text='At most one queued job may have a given key', max_length=255, null=True, verbose_name='Idempotency key')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=10, verbose_name='Status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Attempts made')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Not run before')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Last started')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Finished')),
+                ('error', models.TextField(blank=True, verbose_name='Last error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Queued at')),
+            ],
+            options={
+                'verbose_name': 'Job',
+                'verbose_name_plural': 'Jobs',
+                'ordering': ('run_at', 'id'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['status', 'run_at'], name='job_status_run_at'),
+        ),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'queued')), fields=('key',), name='unique_queued_job_key'),
+        ),
+    ]
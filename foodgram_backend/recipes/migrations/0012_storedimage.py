@@ -0,0 +1,50 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='SHA-256 of the uploaded bytes')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='File name in the storage')),
+                ('width', models.PositiveIntegerField(verbose_name='Width, px')),
+                ('height', models.PositiveIntegerField(verbose_name='Height, px')),
+                ('placeholder', models.CharField(blank=True, max_length=64, verbose_name='BlurHash')),
+                ('references', models.PositiveIntegerField(default=0, verbose_name='Recipes using the image')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Uploaded at')),
+            ],
+            options={
+                'verbose_name': 'Stored image',
+                'verbose_name_plural': 'Stored images',
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(db_index=True, upload_to='recipes_images/', verbose_name='Image encoded in Base64 format'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Image width, px'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Image height, px'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_placeholder',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='BlurHash of the image'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_storedimage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='unweighed_ingredients',
+            field=models.PositiveIntegerField(default=0, verbose_name='Ingredients left out of the nutrition totals'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def queue_rebuild(apps, schema_editor):
+    # Stored buckets were keyed with hash() and match no new key.
+    RecipeBucket = apps.get_model('recipes', 'RecipeBucket')
+    Job = apps.get_model('recipes', 'Job')
+    if RecipeBucket.objects.exists():
+        Job.objects.bulk_create(
+            [Job(
+                function='recipes.similarity.rebuild_all',
+                args=[],
+                key='similarity:all'
+            )],
+            ignore_conflicts=True
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_job_locked_until'),
+    ]
+
+    operations = [
+        migrations.RunPython(queue_rebuild, migrations.RunPython.noop),
+    ]
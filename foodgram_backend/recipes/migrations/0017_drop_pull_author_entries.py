@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+def drop_pull_author_entries(apps, schema_editor):
+    # Inboxes filled before the pull path existed hold the recipes of
+    # pull authors, which the feed also reads from the recipe table.
+    FeedEntry = apps.get_model('recipes', 'FeedEntry')
+    User = apps.get_model('users', 'User')
+    FeedEntry.objects.filter(
+        author_id__in=User.objects.filter(feed_pull=True).values('id')
+    ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0016_rebucket_similar_recipes'),
+        ('users', '0002_user_follower_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            drop_pull_author_entries, migrations.RunPython.noop
+        ),
+    ]
@@ -5,6 +5,7 @@ from django.core.validators import (
     RegexValidator
 )
 from django.db import models
+from django.utils import timezone
 
 
 class Tag(models.Model):
@@ -39,6 +40,11 @@ class Tag(models.Model):
         ],
         verbose_name='Tag slug'
     )
+    bit = models.PositiveSmallIntegerField(
+        unique=True,
+        editable=False,
+        verbose_name='Bit in the recipe tag mask'
+    )
 
     class Meta:
         verbose_name = 'Tag'
@@ -60,6 +66,44 @@ class Ingredient(models.Model):
         max_length=settings.MAX_LENGTH_MEASURING_UNIT,
         verbose_name='Measurement unit'
     )
+    unit_weight = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='Grams in one measurement unit',
+        help_text='Required for units that are not mass or volume',
+    )
+    kcal = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='Calories per 100 g',
+    )
+    protein = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='Protein per 100 g',
+    )
+    fat = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='Fat per 100 g',
+    )
+    carbs = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='Carbohydrates per 100 g',
+    )
+    price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name='Price per 100 g',
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Last modified'
+    )
 
     class Meta:
         verbose_name = 'Ingredient'
@@ -86,8 +130,24 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         upload_to='recipes_images/',
+        db_index=True,
         verbose_name='Image encoded in Base64 format',
     )
+    image_width = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Image width, px',
+    )
+    image_height = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Image height, px',
+    )
+    image_placeholder = models.CharField(
+        max_length=settings.MAX_LENGTH_IMAGE_PLACEHOLDER,
+        blank=True,
+        verbose_name='BlurHash of the image',
+    )
     text = models.TextField(
         max_length=settings.MAX_LENGTH_RECIPE_TEXT,
         verbose_name='Recipe description'
@@ -102,6 +162,12 @@ class Recipe(models.Model):
         Tag,
         verbose_name='List of tag IDs'
     )
+    tags_mask = models.BigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Tag bits',
+        help_text='Kept in sync with the tags',
+    )
     cooking_time = models.PositiveSmallIntegerField(
         validators=[
             MinValueValidator(
@@ -120,6 +186,44 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Publication date'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Last modified'
+    )
+    kcal = models.FloatField(
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name='Calories',
+    )
+    protein = models.FloatField(
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name='Protein, g',
+    )
+    fat = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='Fat, g',
+    )
+    carbs = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='Carbohydrates, g',
+    )
+    cost = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name='Estimated cost',
+    )
+    unweighed_ingredients = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Ingredients left out of the nutrition totals',
+    )
 
     class Meta:
         verbose_name = 'Recipe'
@@ -176,6 +280,20 @@ class ShoppingCart(models.Model):
         related_name='is_in_shopping_cart',
         verbose_name='Recipes in shopping cart',
     )
+    servings = models.PositiveSmallIntegerField(
+        default=1,
+        validators=[
+            MinValueValidator(
+                settings.MIN_SERVINGS,
+                message='Add at least one serving'
+            ),
+            MaxValueValidator(
+                settings.MAX_SERVINGS,
+                message='Too many servings'
+            )
+        ],
+        verbose_name='Number of servings',
+    )
 
     class Meta:
         verbose_name = 'Recipe in shopping cart'
@@ -226,3 +344,336 @@ class RecipeIngredient(models.Model):
 
     def __str__(self) -> str:
         return f'{self.ingredient} for {self.recipe}'
+
+
+class ShoppingListItem(models.Model):
+    """
+    Model storing the aggregated shopping list of a user.
+    Kept in sync with the shopping cart by recipes.shopping_list.
+    """
+
+    user = models.ForeignKey(
+        'users.User',
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='User',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ingredient',
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Total amount',
+    )
+
+    class Meta:
+        verbose_name = 'Shopping list item'
+        verbose_name_plural = 'Shopping list items'
+        ordering = ('ingredient__name',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_item'
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.amount} of {self.ingredient} for {self.user}'
+
+
+class FeedEntry(models.Model):
+    """
+    Model for the inbox of recipes published by followed authors.
+    Filled on write by recipes.feed.
+    """
+
+    user = models.ForeignKey(
+        'users.User',
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Subscriber',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Recipe',
+    )
+    author = models.ForeignKey(
+        'users.User',
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Recipe author',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Publication date'
+    )
+
+    class Meta:
+        verbose_name = 'Feed entry'
+        verbose_name_plural = 'Feed entries'
+        ordering = ('-pub_date', '-recipe_id')
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='feed_entry_user_pub_date'
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='feed_entry_user_author'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.recipe} in feed of {self.user}'
+
+
+class SimilarRecipe(models.Model):
+    """
+    Model storing the nearest neighbours of a recipe.
+    Maintained by recipes.similarity.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Recipe',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Similar recipe',
+    )
+    score = models.FloatField(
+        verbose_name='Similarity score'
+    )
+
+    class Meta:
+        verbose_name = 'Similar recipe'
+        verbose_name_plural = 'Similar recipes'
+        ordering = ('-score', 'similar_id')
+        constraints = [
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='unique_similar_recipe'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('recipe', '-score'),
+                name='similar_recipe_score'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.similar} is similar to {self.recipe}'
+
+
+class RecipeBucket(models.Model):
+    """Model storing the LSH buckets of the MinHash signature of a recipe."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='buckets',
+        verbose_name='Recipe',
+    )
+    band = models.PositiveSmallIntegerField(
+        verbose_name='Signature band'
+    )
+    bucket = models.BigIntegerField(
+        verbose_name='Bucket hash'
+    )
+
+    class Meta:
+        verbose_name = 'Recipe bucket'
+        verbose_name_plural = 'Recipe buckets'
+        ordering = ('id',)
+        indexes = [
+            models.Index(
+                fields=('band', 'bucket'),
+                name='recipe_bucket_band_bucket'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.recipe} in bucket {self.bucket} of band {self.band}'
+
+
+class RecipeCard(models.Model):
+    """
+    Model storing the rendered author, tags and ingredients of a recipe,
+    so that a recipe card is read from one row. Maintained by api.cards.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='card',
+        verbose_name='Recipe',
+    )
+    data = models.JSONField(
+        verbose_name='Rendered author, tags and ingredients'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Last rebuilt'
+    )
+
+    class Meta:
+        verbose_name = 'Recipe card'
+        verbose_name_plural = 'Recipe cards'
+        ordering = ('recipe',)
+
+    def __str__(self) -> str:
+        return f'Card of {self.recipe}'
+
+
+class StoredImage(models.Model):
+    """
+    Model representing an image file stored under the SHA-256 of its
+    uploaded bytes. Kept by recipes.images, which counts the recipes
+    using the file so the gcmedia command can delete unused ones.
+    """
+
+    sha256 = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name='SHA-256 of the uploaded bytes'
+    )
+    name = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name='File name in the storage'
+    )
+    width = models.PositiveIntegerField(
+        verbose_name='Width, px'
+    )
+    height = models.PositiveIntegerField(
+        verbose_name='Height, px'
+    )
+    placeholder = models.CharField(
+        max_length=settings.MAX_LENGTH_IMAGE_PLACEHOLDER,
+        blank=True,
+        verbose_name='BlurHash'
+    )
+    references = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Recipes using the image'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Uploaded at'
+    )
+
+    class Meta:
+        verbose_name = 'Stored image'
+        verbose_name_plural = 'Stored images'
+        ordering = ('id',)
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class Job(models.Model):
+    """
+    Model representing a background job.
+    Queued by recipes.background and run by the runworker command.
+    """
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    function = models.CharField(
+        max_length=255,
+        verbose_name='Dotted path of the function'
+    )
+    args = models.JSONField(
+        default=list,
+        verbose_name='Positional arguments'
+    )
+    key = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        verbose_name='Idempotency key',
+        help_text='At most one queued job may have a given key',
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=QUEUED,
+        verbose_name='Status'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Attempts made'
+    )
+    run_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Not run before'
+    )
+    started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Last started'
+    )
+    locked_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Leased to its worker until',
+        help_text='Extended while the worker runs the job'
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Finished'
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name='Last error'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Queued at'
+    )
+
+    class Meta:
+        verbose_name = 'Job'
+        verbose_name_plural = 'Jobs'
+        ordering = ('run_at', 'id')
+        constraints = [
+            models.UniqueConstraint(
+                fields=('key',),
+                condition=models.Q(status='queued'),
+                name='unique_queued_job_key'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('status', 'run_at'),
+                name='job_status_run_at'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.function} ({self.status})'
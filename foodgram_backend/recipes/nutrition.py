@@ -0,0 +1,135 @@
+from decimal import Decimal
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import (
+    Case, Count, ExpressionWrapper, F, FloatField, Q, Sum, Value, When
+)
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+from recipes import units
+from recipes.models import Recipe, RecipeIngredient
+
+# Recipe field and the Ingredient field holding its value per 100 g.
+NUTRIENTS = (
+    ('kcal', 'kcal'),
+    ('protein', 'protein'),
+    ('fat', 'fat'),
+    ('carbs', 'carbs'),
+    ('cost', 'price'),
+)
+
+
+def unit_factors(measurement_units):
+    """
+    Return the grams in one unit of each measurement unit that has a
+    known weight, taking a millilitre as a gram.
+    """
+    factors = {}
+    for measurement_unit in measurement_units:
+        dimension, factor = units.resolve_unit(measurement_unit)
+        if dimension in (units.MASS, units.VOLUME):
+            factors[measurement_unit] = factor
+    return factors
+
+
+def line_weight(factors):
+    """
+    Return the expression of the weight of a recipe line in grams, NULL
+    when neither the ingredient nor its unit has a known weight.
+    """
+    unit_size = Case(
+        *(
+            When(ingredient__measurement_unit=unit, then=Value(factor))
+            for unit, factor in factors.items()
+        ),
+        default=Value(None),
+        output_field=FloatField()
+    )
+    return ExpressionWrapper(
+        F('amount') * Coalesce('ingredient__unit_weight', unit_size),
+        output_field=FloatField()
+    )
+
+
+def calculate(recipe_ids):
+    """
+    Return {recipe_id: {field: total}} for the recipes, summed by the
+    database in one grouped query. A total stays None when no ingredient
+    of the recipe provides it. unweighed_ingredients counts the lines
+    left out of the totals for lack of a weight, such as pieces of an
+    ingredient without unit_weight.
+    """
+    lines = RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+    factors = unit_factors(
+        lines.values_list(
+            'ingredient__measurement_unit', flat=True
+        ).distinct().order_by()
+    )
+    totals = lines.alias(weight=line_weight(factors)).values(
+        'recipe_id'
+    ).annotate(
+        **{
+            field: Sum(
+                F('weight') * Cast(
+                    f'ingredient__{source}', output_field=FloatField()
+                ) / 100,
+                output_field=FloatField()
+            )
+            for field, source in NUTRIENTS
+        },
+        unweighed_ingredients=Count('id', filter=Q(weight=None))
+    ).order_by()
+    result = {
+        recipe_id: {
+            **dict.fromkeys(field for field, _ in NUTRIENTS),
+            'unweighed_ingredients': 0,
+        }
+        for recipe_id in recipe_ids
+    }
+    for row in totals:
+        values = result[row.pop('recipe_id')]
+        for field, _ in NUTRIENTS:
+            if row[field] is not None:
+                values[field] = round(row[field], 2)
+        if values['cost'] is not None:
+            values['cost'] = Decimal(str(values['cost']))
+        values['unweighed_ingredients'] = row['unweighed_ingredients']
+    return result
+
+
+def update_recipe(recipe):
+    """Recompute the totals of a recipe and set them on the instance."""
+    values = calculate([recipe.id])[recipe.id]
+    Recipe.objects.filter(pk=recipe.id).update(**values)
+    for field, value in values.items():
+        setattr(recipe, field, value)
+
+
+@transaction.atomic
+def recalculate(recipe_ids):
+    """Store the nutrition and cost totals of the recipes."""
+    now = timezone.now()
+    recipes = [
+        Recipe(pk=recipe_id, updated_at=now, **values)
+        for recipe_id, values in calculate(list(recipe_ids)).items()
+    ]
+    Recipe.objects.bulk_update(
+        recipes,
+        [field for field, _ in NUTRIENTS]
+        + ['unweighed_ingredients', 'updated_at'],
+        batch_size=1000
+    )
+
+
+def recalculate_for_ingredients(ingredient_ids, batch_size=1000):
+    """Recompute every recipe using the ingredients, batch by batch."""
+    recipe_ids = RecipeIngredient.objects.filter(
+        ingredient_id__in=ingredient_ids
+    ).values_list('recipe_id', flat=True).distinct().order_by().iterator()
+    while True:
+        batch = list(islice(recipe_ids, batch_size))
+        if not batch:
+            break
+        recalculate(batch)
@@ -0,0 +1,96 @@
+from django.db import transaction
+from django.db.models import F, Sum
+
+from recipes.models import RecipeIngredient, ShoppingCart, ShoppingListItem
+
+
+def recipe_amounts(recipe_id):
+    """Return the total amount of every ingredient of a recipe."""
+    return dict(
+        RecipeIngredient.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('ingredient_id').annotate(
+            total=Sum('amount')
+        ).order_by()
+    )
+
+
+@transaction.atomic
+def apply_recipe(user_id, recipe_id, servings):
+    """
+    Add the ingredients of a recipe multiplied by servings to the
+    shopping list of a user, touching only the affected rows.
+    Negative servings subtract them.
+    """
+    amounts = recipe_amounts(recipe_id)
+    if not amounts or not servings:
+        return
+    if servings > 0:
+        # Rows are created empty first, so concurrent adds of the same
+        # ingredient wait for each other on the lock rather than both
+        # inserting it.
+        ShoppingListItem.objects.bulk_create(
+            [
+                ShoppingListItem(
+                    user_id=user_id, ingredient_id=ingredient_id, amount=0
+                )
+                for ingredient_id in amounts
+            ],
+            ignore_conflicts=True
+        )
+    items = ShoppingListItem.objects.select_for_update().filter(
+        user_id=user_id, ingredient_id__in=amounts
+    )
+    updated, deleted = [], []
+    for item in items:
+        item.amount += servings * amounts[item.ingredient_id]
+        if item.amount > 0:
+            updated.append(item)
+        else:
+            deleted.append(item.pk)
+
+    ShoppingListItem.objects.bulk_update(updated, ('amount',))
+    if deleted:
+        ShoppingListItem.objects.filter(pk__in=deleted).delete()
+
+
+def add_recipe(user_id, recipe_id, servings=1):
+    apply_recipe(user_id, recipe_id, servings)
+
+
+def remove_recipe(user_id, recipe_id, servings=1):
+    apply_recipe(user_id, recipe_id, -servings)
+
+
+@transaction.atomic
+def rebuild(user_ids):
+    """Recompute the shopping lists of the given users from their carts."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    ShoppingListItem.objects.filter(user_id__in=user_ids).delete()
+    rows = RecipeIngredient.objects.filter(
+        recipe__is_in_shopping_cart__user_id__in=user_ids
+    ).values_list(
+        'recipe__is_in_shopping_cart__user_id', 'ingredient_id'
+    ).annotate(
+        total=Sum(F('amount') * F('recipe__is_in_shopping_cart__servings'))
+    ).order_by()
+    ShoppingListItem.objects.bulk_create(
+        (
+            ShoppingListItem(
+                user_id=user_id, ingredient_id=ingredient_id, amount=total
+            )
+            for user_id, ingredient_id, total in rows.iterator()
+        ),
+        batch_size=1000
+    )
+
+
+def rebuild_for_recipe(recipe):
+    """Recompute the shopping lists of users having the recipe in cart."""
+    rebuild(
+        ShoppingCart.objects.filter(
+            recipe=recipe
+        ).values_list('user_id', flat=True)
+    )
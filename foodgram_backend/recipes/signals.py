@@ -0,0 +1,168 @@
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save
+)
+from django.dispatch import Signal, receiver
+
+from recipes import (
+    feed,
+    images,
+    ingredient_search,
+    nutrition,
+    shopping_list,
+    similarity,
+    tag_bits
+)
+from recipes.background import enqueue
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    SimilarRecipe,
+    Tag
+)
+from users.models import Subscription
+
+# Sent with recipe_ids when recipes or their ingredient lines were written
+# in bulk, bypassing model signals, so the api app can refresh its cards.
+recipes_changed = Signal()
+
+# Sent once a chunked deletion removed recipes, so the api app can purge
+# the recipe lists.
+recipes_deleted = Signal()
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        shopping_list.add_recipe(
+            instance.user_id, instance.recipe_id, instance.servings
+        )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    shopping_list.remove_recipe(
+        instance.user_id, instance.recipe_id, instance.servings
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(sender, instance, created, **kwargs):
+    if created:
+        enqueue(feed.fan_out, instance.id, key=f'feed:{instance.id}')
+
+
+@receiver(post_save, sender=Recipe)
+def update_similar_recipes(sender, instance, **kwargs):
+    enqueue(
+        similarity.update_recipe,
+        instance.id,
+        key=f'similarity:{instance.id}'
+    )
+
+
+@receiver(pre_delete, sender=Recipe)
+def refill_similar_recipes(sender, instance, **kwargs):
+    owner_ids = list(
+        SimilarRecipe.objects.filter(similar_id=instance.id).values_list(
+            'recipe_id', flat=True
+        )
+    )
+    if owner_ids:
+        enqueue(similarity.refill, owner_ids)
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_image(sender, instance, update_fields, **kwargs):
+    if update_fields is not None and 'image' not in update_fields:
+        instance._previous_image = instance.image.name
+    elif instance.pk is not None:
+        instance._previous_image = Recipe.objects.filter(
+            pk=instance.pk
+        ).values_list('image', flat=True).first()
+
+
+@receiver(post_save, sender=Recipe)
+def count_image_references(sender, instance, **kwargs):
+    previous = instance.__dict__.pop('_previous_image', None)
+    if instance.image.name != previous:
+        images.retain(instance.image.name)
+        if previous:
+            images.release(previous)
+
+
+@receiver(post_delete, sender=Recipe)
+def release_image(sender, instance, **kwargs):
+    images.release(instance.image.name)
+
+
+@receiver(post_save, sender=Subscription)
+def backfill_feed(sender, instance, created, **kwargs):
+    if created:
+        feed.count_follower(instance.author_id, 1)
+        feed.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def clear_feed(sender, instance, **kwargs):
+    feed.count_follower(instance.author_id, -1)
+    feed.forget(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Ingredient)
+def recalculate_nutrition(sender, instance, created, **kwargs):
+    if not created:
+        enqueue(
+            nutrition.recalculate_for_ingredients,
+            [instance.id],
+            key=f'nutrition:{instance.id}'
+        )
+
+
+@receiver(post_save, sender=Ingredient)
+def index_ingredient(sender, instance, **kwargs):
+    transaction.on_commit(lambda: ingredient_search.update(instance))
+
+
+@receiver(post_delete, sender=Ingredient)
+def unindex_ingredient(sender, instance, **kwargs):
+    ingredient_id = instance.id
+    transaction.on_commit(lambda: ingredient_search.remove(ingredient_id))
+
+
+@receiver(pre_save, sender=Tag)
+def assign_tag_bit(sender, instance, **kwargs):
+    if instance.bit is None:
+        instance.bit = tag_bits.free_bit()
+
+
+@receiver(post_save, sender=Tag)
+def reload_tags(sender, instance, **kwargs):
+    tag_bits.invalidate()
+
+
+@receiver(post_delete, sender=Tag)
+def clear_tag_bit(sender, instance, **kwargs):
+    tag_bits.clear_bit(instance.bit)
+    tag_bits.invalidate()
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def sync_tags_mask(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        instance._cleared_recipe_ids = list(
+            instance.recipe_set.values_list('id', flat=True)
+        )
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        instance.tags_mask = tag_bits.sync([instance.id])[instance.id]
+    elif action == 'post_clear':
+        tag_bits.sync(instance.__dict__.pop('_cleared_recipe_ids'))
+    else:
+        tag_bits.sync(pk_set)
@@ -0,0 +1,277 @@
+import random
+from collections import defaultdict
+from functools import lru_cache
+from heapq import nlargest
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from recipes.models import (
+    Recipe,
+    RecipeBucket,
+    RecipeIngredient,
+    SimilarRecipe
+)
+
+PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+INGREDIENTS_WEIGHT = 0.8
+TAGS_WEIGHT = 0.2
+
+
+@lru_cache(maxsize=None)
+def permutations():
+    """Return the fixed (a, b) pairs of the MinHash hash functions."""
+    generator = random.Random(0)
+    return tuple(
+        (generator.randrange(1, PRIME), generator.randrange(0, PRIME))
+        for _ in range(settings.SIMILARITY_PERMUTATIONS)
+    )
+
+
+def load_features(recipe_ids=None):
+    """Return {recipe_id: (ingredient ids, tag ids)} for the recipes."""
+    ingredients = defaultdict(set)
+    tags = defaultdict(set)
+    lines = RecipeIngredient.objects.values_list('recipe_id', 'ingredient_id')
+    recipe_tags = Recipe.tags.through.objects.values_list(
+        'recipe_id', 'tag_id'
+    )
+    if recipe_ids is not None:
+        lines = lines.filter(recipe_id__in=recipe_ids)
+        recipe_tags = recipe_tags.filter(recipe_id__in=recipe_ids)
+    for recipe_id, ingredient_id in lines.order_by().iterator():
+        ingredients[recipe_id].add(ingredient_id)
+    for recipe_id, tag_id in recipe_tags.order_by().iterator():
+        tags[recipe_id].add(tag_id)
+    return {
+        recipe_id: (ingredients[recipe_id], tags[recipe_id])
+        for recipe_id in ingredients.keys() | tags.keys()
+    }
+
+
+def jaccard(first, second):
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def score(first, second):
+    """Weighted Jaccard similarity of two (ingredients, tags) pairs."""
+    return (
+        INGREDIENTS_WEIGHT * jaccard(first[0], second[0])
+        + TAGS_WEIGHT * jaccard(first[1], second[1])
+    )
+
+
+def signature(features):
+    """Return the MinHash signature of the ingredient and tag set."""
+    ingredients, tags = features
+    tokens = [2 * item for item in ingredients] + [
+        2 * item + 1 for item in tags
+    ]
+    return [
+        min(((a * token + b) % PRIME) & MAX_HASH for token in tokens)
+        for a, b in permutations()
+    ]
+
+
+def buckets(features):
+    """
+    Return the (band, bucket) pairs of a recipe. Recipes sharing at least
+    one pair are the candidates compared exactly.
+    """
+    values = signature(features)
+    rows = len(values) // settings.SIMILARITY_BANDS
+    return [
+        (band, bucket(values[band * rows:(band + 1) * rows]))
+        for band in range(settings.SIMILARITY_BANDS)
+    ]
+
+
+def bucket(band_values):
+    """
+    Fold the signature values of a band into a bucket key, as a
+    polynomial modulo PRIME. Unlike hash(), keys stay the same across
+    Python versions and platforms, so stored buckets keep matching.
+    """
+    key = 0
+    for value in band_values:
+        key = (key * (MAX_HASH + 1) + value) % PRIME
+    return key
+
+
+def nearest(features, candidates):
+    """Return the top (recipe_id, score) pairs among candidate features."""
+    scored = (
+        (candidate_id, score(features, candidate_features))
+        for candidate_id, candidate_features in candidates.items()
+    )
+    return nlargest(
+        settings.SIMILAR_RECIPES_COUNT,
+        (pair for pair in scored if pair[1] > 0),
+        key=itemgetter(1)
+    )
+
+
+@transaction.atomic
+def rebuild_all(batch_size=1000):
+    """Recompute the buckets and neighbours of every recipe."""
+    features = load_features()
+    recipe_buckets = {
+        recipe_id: buckets(recipe_features)
+        for recipe_id, recipe_features in features.items()
+    }
+    index = defaultdict(list)
+    for recipe_id, pairs in recipe_buckets.items():
+        for pair in pairs:
+            index[pair].append(recipe_id)
+
+    RecipeBucket.objects.all().delete()
+    SimilarRecipe.objects.all().delete()
+    RecipeBucket.objects.bulk_create(
+        (
+            RecipeBucket(recipe_id=recipe_id, band=band, bucket=bucket)
+            for recipe_id, pairs in recipe_buckets.items()
+            for band, bucket in pairs
+        ),
+        batch_size=batch_size
+    )
+
+    neighbours = []
+    for recipe_id, pairs in recipe_buckets.items():
+        candidate_ids = {
+            candidate_id for pair in pairs for candidate_id in index[pair]
+        }
+        candidate_ids.discard(recipe_id)
+        for similar_id, similarity in nearest(
+            features[recipe_id],
+            {candidate_id: features[candidate_id]
+             for candidate_id in candidate_ids}
+        ):
+            neighbours.append(SimilarRecipe(
+                recipe_id=recipe_id, similar_id=similar_id, score=similarity
+            ))
+        if len(neighbours) >= batch_size:
+            SimilarRecipe.objects.bulk_create(neighbours)
+            neighbours = []
+    SimilarRecipe.objects.bulk_create(neighbours)
+    return len(features)
+
+
+def _sharing_buckets(pairs):
+    """Return {(band, bucket): recipe ids} for the recipes in the pairs."""
+    by_band = defaultdict(set)
+    for band, bucket in pairs:
+        by_band[band].add(bucket)
+    matches = Q()
+    for band, band_buckets in by_band.items():
+        matches |= Q(band=band, bucket__in=band_buckets)
+    members = defaultdict(set)
+    if matches:
+        for recipe_id, band, bucket in RecipeBucket.objects.filter(
+            matches
+        ).values_list('recipe_id', 'band', 'bucket'):
+            members[band, bucket].add(recipe_id)
+    return members
+
+
+def refill(recipe_ids):
+    """
+    Recompute the neighbours of recipes from the recipes sharing their
+    buckets, after entries were removed from their lists.
+    """
+    if not recipe_ids:
+        return
+    own = defaultdict(list)
+    for recipe_id, band, bucket in RecipeBucket.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'band', 'bucket'):
+        own[recipe_id].append((band, bucket))
+    members = _sharing_buckets(
+        {pair for pairs in own.values() for pair in pairs}
+    )
+    candidates = {
+        recipe_id: {
+            candidate_id for pair in pairs for candidate_id in members[pair]
+        } - {recipe_id}
+        for recipe_id, pairs in own.items()
+    }
+    features = load_features(set(own).union(*candidates.values()))
+    SimilarRecipe.objects.filter(recipe_id__in=recipe_ids).delete()
+    SimilarRecipe.objects.bulk_create(
+        SimilarRecipe(
+            recipe_id=recipe_id, similar_id=similar_id, score=similarity
+        )
+        for recipe_id, candidate_ids in candidates.items()
+        if recipe_id in features
+        for similar_id, similarity in nearest(
+            features[recipe_id],
+            {candidate_id: features[candidate_id]
+             for candidate_id in candidate_ids
+             if candidate_id in features}
+        )
+    )
+
+
+@transaction.atomic
+def update_recipe(recipe_id):
+    """
+    Refresh the buckets and neighbours of an edited recipe, and its place
+    in the neighbour lists of the recipes it is compared with. Lists the
+    recipe drops out of are refilled from their buckets.
+    """
+    former_owners = set(
+        SimilarRecipe.objects.filter(similar_id=recipe_id).values_list(
+            'recipe_id', flat=True
+        )
+    )
+    RecipeBucket.objects.filter(recipe_id=recipe_id).delete()
+    SimilarRecipe.objects.filter(
+        Q(recipe_id=recipe_id) | Q(similar_id=recipe_id)
+    ).delete()
+    features = load_features([recipe_id]).get(recipe_id)
+    if features is None:
+        refill(former_owners)
+        return
+
+    pairs = buckets(features)
+    RecipeBucket.objects.bulk_create(
+        RecipeBucket(recipe_id=recipe_id, band=band, bucket=bucket)
+        for band, bucket in pairs
+    )
+    candidate_ids = set().union(
+        *_sharing_buckets(pairs).values()
+    ) - {recipe_id}
+    candidates = load_features(candidate_ids)
+    SimilarRecipe.objects.bulk_create(
+        SimilarRecipe(
+            recipe_id=recipe_id, similar_id=similar_id, score=similarity
+        )
+        for similar_id, similarity in nearest(features, candidates)
+    )
+
+    current = defaultdict(list)
+    for pk, owner_id, similarity in SimilarRecipe.objects.filter(
+        recipe_id__in=candidate_ids
+    ).values_list('pk', 'recipe_id', 'score'):
+        current[owner_id].append((similarity, pk))
+    created, evicted = [], []
+    for candidate_id, candidate_features in candidates.items():
+        similarity = score(candidate_features, features)
+        if similarity <= 0:
+            continue
+        entries = current[candidate_id]
+        if len(entries) >= settings.SIMILAR_RECIPES_COUNT:
+            weakest = min(entries)
+            if similarity <= weakest[0]:
+                continue
+            evicted.append(weakest[1])
+        created.append(SimilarRecipe(
+            recipe_id=candidate_id, similar_id=recipe_id, score=similarity
+        ))
+    SimilarRecipe.objects.filter(pk__in=evicted).delete()
+    SimilarRecipe.objects.bulk_create(created)
+    refill(former_owners - {entry.recipe_id for entry in created})
@@ -0,0 +1,90 @@
+import time
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import F
+
+from foodgram_backend.cache_metrics import observe_local_cache
+from foodgram_backend.db_router import use_primary
+from recipes.models import Recipe, Tag
+
+_state = {'tags': (), 'by_slug': {}, 'expires': 0.0}
+
+
+def free_bit():
+    """Return the lowest bit not taken by a tag."""
+    used = set(Tag.objects.exclude(bit=None).values_list('bit', flat=True))
+    for bit in range(settings.MAX_TAGS):
+        if bit not in used:
+            return bit
+    raise ValidationError(
+        f'No more than {settings.MAX_TAGS} tags are supported.'
+    )
+
+
+def _loaded():
+    """
+    Return the tags held in memory, reloading them once TAG_MAP_TIMEOUT
+    has passed. Edits made in this process reload them at once, other
+    processes pick them up after the timeout.
+    """
+    state = _state
+    expired = time.monotonic() >= state['expires']
+    observe_local_cache('tag_bits', not expired)
+    if expired:
+        with use_primary():
+            tags = tuple(Tag.objects.order_by('name'))
+        state = {
+            'tags': tags,
+            'by_slug': {tag.slug: tag for tag in tags if tag.slug},
+            'expires': time.monotonic() + settings.TAG_MAP_TIMEOUT,
+        }
+        _state.update(state)
+    return state
+
+
+def invalidate():
+    _state['expires'] = 0.0
+
+
+def tags_for_mask(mask):
+    """Return the tags whose bits are set in mask, ordered by name."""
+    return [tag for tag in _loaded()['tags'] if mask >> tag.bit & 1]
+
+
+def mask_for_slugs(slugs):
+    by_slug = _loaded()['by_slug']
+    mask = 0
+    for slug in slugs:
+        if slug in by_slug:
+            mask |= 1 << by_slug[slug].bit
+    return mask
+
+
+def slug_choices():
+    return [(tag.slug, tag.name) for tag in _loaded()['by_slug'].values()]
+
+
+def sync(recipe_ids):
+    """Recompute and store the tag masks of the recipes."""
+    masks = dict.fromkeys(recipe_ids, 0)
+    for recipe_id, bit in Recipe.tags.through.objects.filter(
+        recipe_id__in=masks
+    ).values_list('recipe_id', 'tag__bit').order_by():
+        masks[recipe_id] |= 1 << bit
+    Recipe.objects.bulk_update(
+        [Recipe(pk=recipe_id, tags_mask=mask)
+         for recipe_id, mask in masks.items()],
+        ('tags_mask',),
+        batch_size=1000
+    )
+    return masks
+
+
+def clear_bit(bit):
+    """Drop the bit of a deleted tag from every recipe having it."""
+    Recipe.objects.alias(
+        has_tag=F('tags_mask').bitand(1 << bit)
+    ).filter(has_tag__gt=0).update(
+        tags_mask=F('tags_mask').bitand(~(1 << bit))
+    )
@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from recipes import deletion
+from recipes.models import Job, Recipe, SimilarRecipe
+
+User = get_user_model()
+
+
+@override_settings(JOBS_EAGER=False)
+class ChunkedDeletionTests(TestCase):
+
+    def setUp(self):
+        author = User.objects.create(
+            email='author@example.com', username='author'
+        )
+        self.deleted, self.kept = (
+            Recipe.objects.create(
+                author=author, name=name, text=name, cooking_time=10
+            )
+            for name in ('Deleted', 'Kept')
+        )
+        SimilarRecipe.objects.create(
+            recipe=self.kept, similar=self.deleted, score=0.5
+        )
+        Job.objects.all().delete()
+
+    def test_delete_recipes_queues_refill_of_neighbour_lists(self):
+        deletion.delete_recipes([self.deleted.id], progress=lambda _: None)
+
+        self.assertFalse(Recipe.objects.filter(id=self.deleted.id).exists())
+        self.assertEqual(
+            list(Job.objects.filter(
+                function='recipes.similarity.refill'
+            ).values_list('args', flat=True)),
+            [[[self.kept.id]]]
+        )
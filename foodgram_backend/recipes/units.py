@@ -0,0 +1,102 @@
+import unicodedata
+
+MASS = 'mass'
+VOLUME = 'volume'
+PIECES = 'pieces'
+
+BASE_UNITS = {
+    MASS: 'г',
+    VOLUME: 'мл',
+    PIECES: 'шт.',
+}
+
+# Larger units used for rendering, with the amount of base units in them.
+DISPLAY_UNITS = {
+    MASS: (('кг', 1000),),
+    VOLUME: (('л', 1000),),
+    PIECES: (),
+}
+
+UNITS = {
+    'мг': (MASS, 0.001),
+    'г': (MASS, 1),
+    'гр': (MASS, 1),
+    'кг': (MASS, 1000),
+    'мл': (VOLUME, 1),
+    'л': (VOLUME, 1000),
+    'капля': (VOLUME, 0.05),
+    'ч. л.': (VOLUME, 5),
+    'ст. л.': (VOLUME, 15),
+    'стакан': (VOLUME, 250),
+    'шт': (PIECES, 1),
+    'шт.': (PIECES, 1),
+}
+
+
+def normalize_text(value):
+    """Fold case, whitespace and Unicode variants of a name or a unit."""
+    value = unicodedata.normalize('NFKC', value).lower().replace('ё', 'е')
+    return ' '.join(value.split())
+
+
+def resolve_unit(measurement_unit):
+    """
+    Return the dimension of a unit and its size in base units.
+    Units that cannot be converted, such as "по вкусу", form their own
+    dimension with a factor of one.
+    """
+    unit = normalize_text(measurement_unit)
+    return UNITS.get(unit, (unit, 1))
+
+
+def aggregate(rows):
+    """
+    Sum amounts of (name, measurement_unit, amount) rows by canonical
+    ingredient name and dimension, in base units. Each unit spelling is
+    resolved once. Returns a list of (name, dimension, total) sorted by
+    name, where name is the first spelling met for the group.
+    """
+    resolved = {}
+    groups = {}
+    for name, measurement_unit, amount in rows:
+        unit = resolved.get(measurement_unit)
+        if unit is None:
+            unit = resolved[measurement_unit] = resolve_unit(
+                measurement_unit
+            )
+        dimension, factor = unit
+        key = (normalize_text(name), dimension)
+        group = groups.get(key)
+        if group is None:
+            groups[key] = [' '.join(name.split()), amount * factor]
+        else:
+            group[1] += amount * factor
+    return [
+        (name, dimension, total)
+        for (_, dimension), (name, total) in sorted(groups.items())
+    ]
+
+
+def humanize(dimension, total):
+    """Return a total in base units as an (amount, unit) pair to show."""
+    if dimension not in BASE_UNITS:
+        return _round(total), dimension
+    unit, size = BASE_UNITS[dimension], 1
+    for display_unit, display_size in DISPLAY_UNITS[dimension]:
+        if total >= display_size:
+            unit, size = display_unit, display_size
+    return _round(total / size), unit
+
+
+def _round(value):
+    value = round(value, 2)
+    return int(value) if value == int(value) else value
+
+
+def render(rows):
+    """Aggregate rows and return (name, amount, unit) lines to display."""
+    lines = []
+    for name, dimension, total in aggregate(rows):
+        amount, unit = humanize(dimension, total)
+        lines.append((name, amount, unit))
+    return lines
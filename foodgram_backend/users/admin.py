@@ -1,5 +1,7 @@
 from django.contrib import admin
 
+from recipes import deletion
+from recipes.background import enqueue
 from users.models import User
 
 
@@ -22,3 +24,12 @@ class UserAdmin(admin.ModelAdmin):
         'date_joined',
     )
     ordering = ('username',)
+    actions = ('delete_in_background',)
+
+    @admin.action(description='Delete selected users in the background')
+    def delete_in_background(self, request, queryset):
+        user_ids = list(queryset.values_list('id', flat=True))
+        enqueue(deletion.delete_users, user_ids)
+        self.message_user(
+            request, f'Deletion of {len(user_ids)} users is queued.'
+        )
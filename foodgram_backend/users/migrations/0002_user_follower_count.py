@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_followers(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Subscription = apps.get_model('users', 'Subscription')
+    User.objects.update(follower_count=Coalesce(
+        Subquery(
+            Subscription.objects.filter(author=OuterRef('pk')).values(
+                'author'
+            ).annotate(count=Count('id')).values('count')
+        ),
+        0
+    ))
+    User.objects.filter(
+        follower_count__gt=settings.FEED_PULL_FOLLOWERS_THRESHOLD
+    ).update(feed_pull=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Followers'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='feed_pull',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='Recipes read by followers at request time'),
+        ),
+        migrations.RunPython(count_followers, migrations.RunPython.noop),
+    ]
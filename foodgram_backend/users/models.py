@@ -38,6 +38,15 @@ class User(AbstractUser):
         verbose_name='Surname',
         help_text='Enter your surname',
     )
+    follower_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Followers',
+    )
+    feed_pull = models.BooleanField(
+        default=False,
+        db_index=True,
+        verbose_name='Recipes read by followers at request time',
+    )
 
     class Meta:
         verbose_name = 'User'